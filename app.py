@@ -1,5 +1,4 @@
 import os
-import json
 import base64
 from pathlib import Path
 
@@ -7,12 +6,19 @@ import streamlit as st
 import pandas as pd
 import pydeck as pdk  # já vem com Streamlit
 
-from utils import evaluate_requirements, load_keyword_map
+from engine import EngineHolder
+from search import Autocomplete, autocomplete_entries
+from geo import GeoIndex
+from geostore import GeometryStore
+from utils import (
+    evaluate_policy, match_profile, EligibilityState,
+    ResultCache, profile_key, profile_mask, unlock_suggestions, top_matches_split,
+)
 
 from db import (
     # migrações / boot
-    init_db, migrate_db, migrate_accounts, migrate_analytics, 
-    log_event, get_analytics, 
+    bootstrap_db,
+    log_event, get_analytics, search_term_counts, set_geo_index, event_stats,
     # registro / login
     create_person_account, create_collective_account,
     authenticate_person, authenticate_collective,
@@ -22,12 +28,9 @@ from db import (
 )
 
 # ------------------------------------------------------------------
-# Boot do banco (uma vez só)
+# Boot do banco (uma vez por processo; reruns só checam uma flag)
 # ------------------------------------------------------------------
-init_db()
-migrate_db()        # garante created_at/updated_at
-migrate_accounts()  # cria accounts e coluna owner_account_id em profiles
-migrate_analytics() 
+bootstrap_db()
 
 # ------------------------------------------------------------------
 # Configuração geral
@@ -46,46 +49,104 @@ button[kind="primary"] { padding: 0.6rem 1rem; }
 DATA_PATH = os.path.join("data", "politicas_publicas.xlsx")
 KW_PATH = "keyword_map.json"
 SCHEMA_PATH = "profile_schema.json"
+# "exact" (substring) ou "fuzzy" (trigramas, tolera plural/gênero/erros de digitação)
+MATCH_MODE = os.getenv("MATCH_MODE", "exact")
 
-@st.cache_data
-def load_data():
-    df = pd.read_excel(DATA_PATH, sheet_name=0)
-    df.columns = [c.strip() for c in df.columns]
-    cols = [
-        "Número",
-        "Politicas publicas",
-        "nivel",
-        "Operacionalização/Aplicação",
-        "Descrição dos direitos",
-        "Acesso",
-        "Organização interna (Subprogramas e/ou Eixos)",
-        "Link",
-        "Observações",
-    ]
-    keep = [c for c in cols if c in df.columns]
-    return df[keep].copy()
+@st.cache_resource
+def engine_holder():
+    """Catálogo + regras + índices, recarregados em segundo plano quando os arquivos mudam."""
+    return EngineHolder(DATA_PATH, KW_PATH, SCHEMA_PATH, MATCH_MODE).start()
+
+# Páginas que mostram resultados guardados na sessão (índices do df) continuam
+# no snapshot com que foram calculados; nas demais a sessão adota o mais novo.
+_PINNED_PAGES = ("matches", "policy_detail")
+
+def session_engine():
+    latest = engine_holder().current()
+    eng = st.session_state.get("engine")
+    if eng is None or (eng is not latest and st.session_state.get("page") not in _PINNED_PAGES):
+        eng = st.session_state.engine = latest
+    return eng
+
+engine = session_engine()
+df = engine.df
+schema, kw_map = engine.schema, engine.kw_map
+req_index = engine.index
 
 @st.cache_resource
-def load_configs():
-    with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
-        schema = json.load(f)
-    kw_map = load_keyword_map(KW_PATH)
-    return schema, kw_map
+def match_cache():
+    """Resultados de elegibilidade compartilhados entre sessões (LRU + TTL)."""
+    return ResultCache(maxsize=2048, ttl=6 * 3600)
+
+def match_profile_cached(profile):
+    return match_cache().get_or_compute(
+        profile_key(req_index, profile), engine.version,
+        lambda: match_profile(req_index, profile, kw_map),
+    )
 
-df = load_data()
-schema, kw_map = load_configs()
+TOP_N_OPTIONS = [10, 20, 50, 100]
+
+def store_top_matches(profile):
+    """
+    Guarda na sessão só as N políticas mais relevantes de cada lista (seleção
+    por heap), não o catálogo todo, e as sugestões de desbloqueio. Quase
+    elegíveis já vêm na ordem de exibição. As passadas pelo catálogo inteiro
+    ficam aqui; os reruns do fragmento (trocas de página) só leem a sessão.
+    """
+    n = int(st.session_state.get("top_n", 20))
+    eligible, nearly = top_matches_split(req_index, profile, kw_map, n)
+    st.session_state.eligible = [(idx, met, missing) for idx, _s, met, missing in eligible]
+    st.session_state.nearly = [(idx, met, missing) for idx, _s, met, missing in nearly]
+    st.session_state.scores = {idx: score for idx, score, _m, _x in eligible + nearly}
+    st.session_state.unlock = unlock_suggestions(req_index, profile_mask(req_index, profile), top=3)
+
+def search_view(q, sel_niveis):
+    """Políticas filtradas por nível e, se houver busca, ordenadas por relevância (BM25)."""
+    niveis = sel_niveis if sel_niveis and "nivel" in df.columns else None
+    if q:
+        return df.loc[engine.search.search(q, niveis)]
+    return df[df["nivel"].isin(niveis)] if niveis else df
 
-@st.cache_data
+@st.cache_resource(ttl=600)
+def autocomplete(version: str):
+    """Sugestões por prefixo da versão `version` do catálogo; a contagem de buscas é relida a cada 10 min."""
+    try:
+        searches = search_term_counts()
+    except Exception:
+        searches = {}
+    return Autocomplete(autocomplete_entries(df, kw_map, req_index.policy_keys, searches))
+
+def suggestion_buttons(key: str, q: str):
+    """Sugestões abaixo do campo de busca `key`; clicar numa delas preenche o campo."""
+    sugg = [s for s in autocomplete(engine.version).suggest(q, limit=5) if s[0].lower() != q] if q else []
+    if not sugg:
+        return
+    def fill(text):
+        st.session_state[key] = text
+    cols = st.columns(len(sugg))
+    for i, (text, kind) in enumerate(sugg):
+        with cols[i]:
+            label = text if len(text) <= 40 else text[:38] + "…"
+            st.button(label, key=f"{key}_sugg_{i}", help=f"{kind}: {text}", use_container_width=True,
+                      on_click=fill, args=(text,))
+
+@st.cache_resource
 def load_geo():
+    """Tabelas de UFs/municípios + índices de consulta. Compartilhado e somente leitura (não alterar)."""
     ufs_path = os.path.join("data", "geo", "ufs.csv")
     mun_path = os.path.join("data", "geo", "municipios.csv")
-    gj_path  = os.path.join("data", "geo", "municipios_simplificado.geojson")
     ufs = pd.read_csv(ufs_path, dtype={"ibge_uf": str}) if os.path.exists(ufs_path) else pd.DataFrame()
     mun = pd.read_csv(mun_path, dtype={"ibge_mun": str}) if os.path.exists(mun_path) else pd.DataFrame()
-    gj  = json.load(open(gj_path, "r", encoding="utf-8")) if os.path.exists(gj_path) else None
-    return ufs, mun, gj
+    return ufs, mun, GeoIndex(ufs, mun)
 
-ufs_df, mun_df, mun_geojson = load_geo()
+ufs_df, mun_df, geo_index = load_geo()
+set_geo_index(geo_index)  # log_event/get_analytics resolvem códigos IBGE com o mesmo índice
+
+@st.cache_resource
+def geometry_store():
+    """Malha municipal compacta (build_geo.py); aberta só quando o mapa pede os limites."""
+    path = os.path.join("data", "geo", "municipios.mgeo")
+    return GeometryStore(path) if os.path.exists(path) else None
 
 # ------------------------------------------------------------------
 # Estado de navegação
@@ -114,6 +175,46 @@ if "current_profile_id" not in st.session_state:
 def goto(page_name: str):
     st.session_state.page = page_name
 
+# Trechos decorados com @fragment reexecutam sozinhos quando o usuário mexe
+# neles (busca, filtros, paginação), sem rodar o script inteiro de novo.
+# st.fragment só existe a partir do Streamlit 1.37; antes era experimental.
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+def leave_fragment_if_navigated(page: str):
+    """Callbacks dentro de um fragment mudam a página, mas só o fragment rodaria: força o rerun completo."""
+    if st.session_state.get("page") != page:
+        st.rerun()
+
+PAGE_SIZE = 10
+
+def paginate(key: str, items, page_size: int = PAGE_SIZE, signature=None):
+    """
+    Devolve só a página atual de `items` e desenha os botões Anterior/Próxima.
+    O cursor (posição inicial) fica na sessão; volta ao início quando
+    `signature` (ex.: busca + filtros) muda.
+    """
+    state = st.session_state.setdefault(f"_cursor_{key}", {"sig": signature, "pos": 0})
+    if state["sig"] != signature:
+        state.update(sig=signature, pos=0)
+    total = len(items)
+    pos = min(state["pos"], max(total - 1, 0) // page_size * page_size)
+    state["pos"] = pos
+    end = min(pos + page_size, total)
+
+    if total > page_size:
+        def move(delta):
+            state["pos"] = max(0, pos + delta)
+        c1, c2, c3 = st.columns([1, 2, 1])
+        with c1:
+            st.button("← Anterior", key=f"{key}_prev", disabled=pos == 0,
+                      use_container_width=True, on_click=move, args=(-page_size,))
+        with c2:
+            st.caption(f"{pos + 1}–{end} de {total}")
+        with c3:
+            st.button("Próxima →", key=f"{key}_next", disabled=end >= total,
+                      use_container_width=True, on_click=move, args=(page_size,))
+    return items[pos:end]
+
 # ------------------------------------------------------------------
 # Helpers de UI / Auth
 # ------------------------------------------------------------------
@@ -129,6 +230,10 @@ def current_location_from_state():
     mun = st.session_state.get("municipio_select") or st.session_state.profile.get("municipio") or None
     return (uf or "").strip() or None, (mun or "").strip() or None
 
+def current_ibge_mun():
+    """Código IBGE do município escolhido no formulário (se houver)."""
+    return st.session_state.get("ibge_mun") or st.session_state.profile.get("ibge_mun")
+
 def current_gender_from_profile():
     """Tenta pegar 'gênero' do perfil (ajuste o nome do campo conforme seu schema)."""
     # troque 'genero' se no seu profile_schema for outro nome (ex.: 'sexo', 'identidade_genero')
@@ -150,11 +255,13 @@ def post_login_redirect_if_needed():
         del st.session_state["post_login_goto"]
         goto(dest)
 
-def small_card(policy_row, met=None, missing=None, selectable=False, on_select=None):
+def small_card(policy_row, met=None, missing=None, selectable=False, on_select=None, score=None):
     title = policy_row.get("Politicas publicas", "(sem título)")
     nivel = policy_row.get("nivel", "")
     with st.container(border=True):
         st.markdown(f"**{title}**  \n*Nível:* {nivel}")
+        if score is not None:
+            st.progress(float(score), text=f"Aderência ao perfil: {score:.0%}")
         desc = policy_row.get("Descrição dos direitos", "")
         if desc:
             st.write(desc)
@@ -181,12 +288,17 @@ def small_card(policy_row, met=None, missing=None, selectable=False, on_select=N
         if selectable and on_select:
             st.button("Quero escolher esta política", use_container_width=True, on_click=on_select)
 
+@st.cache_data
+def logo_img_tag(path: str, mtime: float) -> str:
+    """<img> com a logo embutida em base64; recalcula só se o arquivo mudar (mtime)."""
+    b64 = base64.b64encode(Path(path).read_bytes()).decode()
+    return f'<img src="data:image/png;base64,{b64}" width="140">'
+
 def footer():
     st.markdown("---")
     logo_path = Path("static/logo.png")  # ajuste para .jpg/.svg se for o caso
     if logo_path.exists():
-        b64 = base64.b64encode(logo_path.read_bytes()).decode()
-        img_tag = f'<img src="data:image/png;base64,{b64}" width="140">'
+        img_tag = logo_img_tag(str(logo_path), logo_path.stat().st_mtime)
     else:
         img_tag = "<!-- logo não encontrada -->"
 
@@ -199,29 +311,6 @@ def footer():
         """,
         unsafe_allow_html=True
     )
-# --- Helpers para o mapa do Observatório ---
-def _guess_latlon_cols(df):
-    """Retorna (lat_col, lon_col) se existirem no DF, senão (None, None)."""
-    if df is None or df.empty:
-        return None, None
-    candidates = [
-        ("lat", "lon"),
-        ("latitude", "longitude"),
-        ("lat", "long"),
-        ("y", "x"),
-    ]
-    cols = {c.lower(): c for c in df.columns}
-    for la, lo in candidates:
-        if la in cols and lo in cols:
-            return cols[la], cols[lo]
-    return None, None
-
-def _normalize_text(s):
-    """Normaliza texto p/ comparação simples (minúsculo, sem espaços extras)."""
-    if s is None:
-        return ""
-    return str(s).strip().lower()
-
 # ------------------------------------------------------------------
 # Páginas
 # ------------------------------------------------------------------
@@ -351,48 +440,44 @@ def page_auth():
 
     st.button("← Voltar à apresentação", on_click=lambda: goto("home"))
 
-def page_policies_overview():
-    header_nav("Políticas públicas mapeadas", "Explore as políticas e leia um breve resumo.")
-
+@fragment
+def overview_results():
+    """Busca + filtros + lista paginada: só este trecho reexecuta ao digitar ou paginar."""
     cols = st.columns([2, 2, 1])
     with cols[0]:
-        q = st.text_input("Buscar por nome, direitos ou requisitos", value="").strip().lower()
+        q = st.text_input("Buscar por nome, direitos ou requisitos", key="overview_q").strip().lower()
     with cols[1]:
         niveis = sorted(df["nivel"].dropna().unique().tolist()) if "nivel" in df.columns else []
         sel_niveis = st.multiselect("Filtrar por nível", options=niveis, default=[])
     with cols[2]:
-        limit = st.number_input("Qtd. itens", min_value=1, max_value=40, value=40, step=1)
-        
-        # Loga busca (se houver termo)
-    if q:
+        limit = st.number_input("Itens por página", min_value=1, max_value=40, value=PAGE_SIZE, step=1)
+    suggestion_buttons("overview_q", q)
+
+    # Loga busca (uma vez por termo; paginar não conta como nova busca)
+    if q and st.session_state.get("_last_search") != q:
+        st.session_state._last_search = q
         uf, mun = current_location_from_state()
         gender = current_gender_from_profile()
         try:
-            log_event(kind="search", uf=uf, municipio=mun, query=q)
+            log_event(kind="search", uf=uf, municipio=mun, query=q, ibge_mun=current_ibge_mun())
         except Exception:
             pass
 
-    view = df.copy()
-    if sel_niveis and "nivel" in view.columns:
-        view = view[view["nivel"].isin(sel_niveis)]
-
-    if q:
-        def _contains(row):
-            campos = []
-            for c in ["Politicas publicas", "Descrição dos direitos", "Acesso", "Organização interna (Subprogramas e/ou Eixos)"]:
-                if c in row and pd.notna(row[c]):
-                    campos.append(str(row[c]).lower())
-            return q in " | ".join(campos)
-        view = view[view.apply(_contains, axis=1)]
+    view = search_view(q, sel_niveis)
 
     total = len(view)
-    st.caption(f"Exibindo até {min(limit, total)} de {total} políticas encontradas.")
+    st.caption(f"{total} políticas encontradas.")
 
     if total == 0:
         st.info("Nenhuma política encontrada com os filtros atuais.")
     else:
-        for _, row in view.head(int(limit)).iterrows():
-            small_card(row, selectable=False)
+        for idx in paginate("overview", view.index, int(limit), (q, tuple(sel_niveis), int(limit))):
+            small_card(view.loc[idx], selectable=False)
+
+def page_policies_overview():
+    header_nav("Políticas públicas mapeadas", "Explore as políticas e leia um breve resumo.")
+
+    overview_results()
 
     st.divider()
     c1, c2, c3 = st.columns(3)
@@ -469,9 +554,9 @@ def page_profile():
             st.info("Entre ou crie conta para salvar e gerenciar versões do seu perfil.")
 
     # ===== UF fora do form (reativo) =====
-    if not ufs_df.empty:
-        uf_options = ufs_df["uf"].tolist()
-        uf_labels  = {r["uf"]: r["uf_nome"] for _, r in ufs_df.iterrows()}
+    if geo_index.uf_options:
+        uf_options = geo_index.uf_options
+        uf_labels  = geo_index.uf_labels
 
         def _on_change_uf():
             st.session_state.pop("municipio_select", None)
@@ -494,20 +579,17 @@ def page_profile():
         sel_uf = st.session_state.get("uf", prev.get("estado", ""))
 
         # Município dependente da UF
-        if not mun_df.empty:
-            mun_opts_df = mun_df.loc[mun_df["uf"] == sel_uf, :] if sel_uf else mun_df
-            nomes = mun_opts_df["nome_mun"].tolist()
-            default_mun = prev.get("municipio") if prev.get("municipio") in nomes else (nomes[0] if nomes else "")
+        if geo_index.mun_code:
+            nomes = geo_index.municipios(sel_uf)
             st.selectbox(
                 "Município",
                 options=nomes,
-                index=nomes.index(default_mun) if default_mun in nomes else 0,
+                index=geo_index.position(sel_uf, prev.get("municipio")) or 0,
                 key="municipio_select",
             )
-            if not mun_opts_df.empty and st.session_state.get("municipio_select"):
-                row_sel = mun_opts_df.loc[mun_opts_df["nome_mun"] == st.session_state["municipio_select"]].head(1)
-                if not row_sel.empty:
-                    st.session_state["ibge_mun"] = str(row_sel.iloc[0]["ibge_mun"])
+            code = geo_index.code_for(sel_uf, st.session_state.get("municipio_select"))
+            if code:
+                st.session_state["ibge_mun"] = code
         else:
             st.text_input("Município", value=prev.get("municipio", ""), key="municipio_select")
 
@@ -563,15 +645,9 @@ def page_profile():
     # Botão 1 → calcular e ir para Resultados (matches)
     if submit_matches:
         st.session_state.profile = profile
-        eligible_rows, nearly_rows = [], []
-        if "Acesso" in df.columns:
-            for idx, row in df.iterrows():
-                acesso = row.get("Acesso", "")
-                met, missing = evaluate_requirements(str(acesso), profile, kw_map)
-                if acesso and (met or missing):
-                    (nearly_rows if missing else eligible_rows).append((idx, met, missing))
-        st.session_state.eligible = eligible_rows
-        st.session_state.nearly = nearly_rows
+        eligible_rows, nearly_rows = match_profile_cached(profile)
+        store_top_matches(profile)
+        st.session_state.match_counts = (len(eligible_rows), len(nearly_rows))
         
         # Agrega requisitos PRESENTES (met) e AUSENTES (missing) dos "quase elegíveis"
         uf, mun = current_location_from_state()
@@ -582,7 +658,7 @@ def page_profile():
             if met:     met_terms.extend(list(met))
 
         try:
-            log_event(kind="matches", uf=uf, municipio=mun, gender=gender,
+            log_event(kind="matches", uf=uf, municipio=mun, gender=gender, ibge_mun=current_ibge_mun(),
                       met=met_terms, missing=missing_terms,
                       extras={"eligible_cnt": len(eligible_rows), "nearly_cnt": len(nearly_rows)})
         except Exception:
@@ -592,7 +668,7 @@ def page_profile():
         try:
             for idx, met, _missing in eligible_rows:
                 pol = str(df.loc[idx].get("Politicas publicas", ""))
-                log_event(kind="eligible", policy=pol, uf=uf, municipio=mun, gender=gender)
+                log_event(kind="eligible", policy=pol, uf=uf, municipio=mun, gender=gender, ibge_mun=current_ibge_mun())
         except Exception:
             pass       
 
@@ -603,8 +679,57 @@ def page_profile():
         st.session_state.profile = profile
         goto("policy_picker")
 
+    simulation_panel(profile)
+
     st.button("← Voltar", use_container_width=True, on_click=lambda: goto("home"))
 
+def simulation_panel(profile):
+    """
+    Simulação "e se...?": fora do form, cada mudança reavalia só as políticas
+    que dependem do campo alterado (EligibilityState) e atualiza as contagens.
+    """
+    with st.expander("🔁 Simulação: e se eu mudar alguma resposta?"):
+        sim = st.session_state.get("sim_state")
+        reset = st.button("Recomeçar a partir do formulário")
+        if reset or sim is None or sim.index is not req_index:
+            sim = st.session_state.sim_state = EligibilityState(req_index, kw_map, profile)
+            st.session_state.sim_base = (sim.eligible_cnt, sim.nearly_cnt)
+            for f in req_index.field_policies:
+                st.session_state.pop(f"sim_{f}", None)
+
+        def _on_change(field):
+            st.session_state.sim_state.update(field, st.session_state[f"sim_{field}"])
+
+        for field in req_index.field_policies:
+            spec = schema.get(field)
+            if not spec:
+                continue
+            label = spec.get("label", field)
+            cur = sim.profile.get(field)
+            kwargs = dict(key=f"sim_{field}", on_change=_on_change, args=(field,))
+            t = spec.get("type", "text")
+            if t == "bool":
+                st.toggle(label, value=bool(cur), **kwargs)
+            elif t == "number":
+                st.number_input(label, min_value=0.0, step=1.0, format="%.0f", value=float(cur or 0), **kwargs)
+            elif t == "select":
+                options = spec.get("options", []) or [""]
+                st.selectbox(label, options, index=options.index(cur) if cur in options else 0, **kwargs)
+
+        base_e, base_n = st.session_state.sim_base
+        m1, m2 = st.columns(2)
+        m1.metric("Elegíveis", sim.eligible_cnt, delta=sim.eligible_cnt - base_e)
+        m2.metric("Quase elegíveis", sim.nearly_cnt, delta=sim.nearly_cnt - base_n, delta_color="off")
+
+        def _show_simulated():
+            sim = st.session_state.sim_state
+            st.session_state.profile = dict(sim.profile)
+            store_top_matches(st.session_state.profile)
+            st.session_state.match_counts = (sim.eligible_cnt, sim.nearly_cnt)
+            goto("matches")
+
+        st.button("Ver políticas desta simulação", use_container_width=True, on_click=_show_simulated)
+
 def page_observatorio():
     header_nav("Observatório", "Mapa de calor e rankings por localidade, gênero e período.")
 
@@ -612,11 +737,28 @@ def page_observatorio():
     with st.sidebar:
         st.header("Filtros")
         period = st.selectbox("Período", ["Últimos 7 dias", "Últimos 30 dias", "Últimos 90 dias", "Tudo"], index=1)
-        uf_filter = st.text_input("UF (ex.: AM, PA, AC)", value="")
-        mun_filter = st.text_input("Município (opcional)", value="")
+        if geo_index.uf_options:
+            uf_filter = st.selectbox("UF", ("",) + geo_index.uf_options,
+                                     format_func=lambda x: f"{x} — {geo_index.uf_labels.get(x, '')}" if x else "Todas")
+            mun_filter = st.selectbox("Município (opcional)", ("",) + geo_index.municipios(uf_filter) if uf_filter else ("",),
+                                      format_func=lambda x: x or "Todos")
+        else:
+            uf_filter = st.text_input("UF (ex.: AM, PA, AC)", value="")
+            mun_filter = st.text_input("Município (opcional)", value="")
         gender_filter = st.text_input("Gênero (opcional)", value="")  # ajuste para selectbox se tiver opções fixas
         topn = st.number_input("Top N (ranking)", min_value=3, max_value=50, value=10, step=1)
 
+        with st.expander("Cache de elegibilidade"):
+            cs = match_cache().stats()
+            st.caption(
+                f"{cs['hits']} acertos • {cs['misses']} falhas • taxa {cs['hit_rate']:.0%}  \n"
+                f"{cs['size']} perfis em cache • {cs['evictions']} descartes • {cs['invalidations']} invalidações"
+            )
+            holder = engine_holder()
+            st.caption(f"Catálogo v{engine.version} • {holder.reloads} recarga(s) automática(s)")
+            if holder.last_error:
+                st.caption(f"⚠️ Última recarga falhou: {holder.last_error}")
+
     from datetime import datetime, timedelta
     now = datetime.utcnow()
     if period == "Últimos 7 dias":
@@ -632,14 +774,30 @@ def page_observatorio():
     mun_f = mun_filter.strip() or None
     gen_f = gender_filter.strip() or None
 
-    # --- Busca eventos conforme filtros globais ---
+    # --- Busca eventos conforme filtros globais (UF/município viram código IBGE) ---
     events = get_analytics(start_iso=start_iso, end_iso=end_iso, uf=uf_f, municipio=mun_f, gender=gen_f)
+    es = event_stats()
+    if es["dropped"] or es["failed"]:
+        st.caption(f"⚠️ Eventos não registrados neste processo: {es['dropped']} descartados (fila cheia), "
+                   f"{es['failed']} com erro de gravação.")
     if not events:
         st.info("Sem eventos para os filtros atuais.")
         return
 
     import pandas as pd
     ev = pd.DataFrame(events)
+    ev["ibge_uf"] = ev["ibge_uf"].astype("Int64")
+    ev["ibge_mun"] = ev["ibge_mun"].astype("Int64")
+
+    def _with_place_names(df):
+        """Troca ibge_mun pelos nomes canônicos (UF, município) para exibir o ranking."""
+        if "ibge_mun" not in df.columns:
+            return df
+        places = df["ibge_mun"].map(lambda c: geo_index.lookup(c) or ("", "") if pd.notna(c) else ("", ""))
+        out = df.drop(columns=["ibge_mun"])
+        out.insert(0, "municipio", places.map(lambda p: p[0]))
+        out.insert(0, "uf", places.map(lambda p: p[1]))
+        return out
 
    # --- Seletor de Métrica (robusto) ---
   # --- Seletor de Métrica (robusto por índice) ---
@@ -662,23 +820,6 @@ def page_observatorio():
 
     metric_code = METRIC_OPTIONS[choice_idx][0] #type: ignore
 
-    # --- Geo helpers (para mapa) ---
-    def _guess_latlon_cols(df):
-        if df is None or df.empty: return None, None
-        candidates = [("lat", "lon"), ("latitude", "longitude"), ("lat", "long"), ("y", "x")]
-        cols = {c.lower(): c for c in df.columns}
-        for la, lo in candidates:
-            if la in cols and lo in cols:
-                return cols[la], cols[lo]
-        return None, None
-
-    def _normalize_text(s):
-        if s is None: return ""
-        return str(s).strip().lower()
-
-    lat_mun, lon_mun = _guess_latlon_cols(mun_df)
-    lat_uf,  lon_uf  = _guess_latlon_cols(ufs_df)
-
     # --- Seleção do subconjunto por métrica + dados p/ ranking ---
     ranking_df = None
     heat_source = None
@@ -687,47 +828,47 @@ def page_observatorio():
     if metric_code == "views":  # 5) Políticas Mais Acessadas
         view = ev[ev["kind"] == "view"].copy()
         if not view.empty:
-            group_cols = (["uf", "municipio", "policy"] if (uf_f is None and mun_f is None) else ["policy"])
+            group_cols = (["ibge_mun", "policy"] if (uf_f is None and mun_f is None) else ["policy"])
             ranking_df = (view.groupby(group_cols)
                             .size().reset_index(name="acessos")
                             .sort_values("acessos", ascending=False)
                             .head(int(topn)))
-            heat_source = view.groupby(["uf", "municipio"]).size().reset_index(name="weight")
+            heat_source = view.groupby(["ibge_uf", "ibge_mun"], dropna=False).size().reset_index(name="weight")
             heat_label = "Acessos"
 
     elif metric_code == "eligible":  # 4) Políticas mais adequadas
         elig = ev[ev["kind"] == "eligible"].copy()
         if not elig.empty:
-            group_cols = (["uf", "municipio", "policy"] if (uf_f is None and mun_f is None) else ["policy"])
+            group_cols = (["ibge_mun", "policy"] if (uf_f is None and mun_f is None) else ["policy"])
             ranking_df = (elig.groupby(group_cols)
                             .size().reset_index(name="adequações")
                             .sort_values("adequações", ascending=False)
                             .head(int(topn)))
-            heat_source = elig.groupby(["uf", "municipio"]).size().reset_index(name="weight")
+            heat_source = elig.groupby(["ibge_uf", "ibge_mun"], dropna=False).size().reset_index(name="weight")
             heat_label = "Adequações"
 
     elif metric_code == "req_missing":  # 3) Requisitos mais ausentes
         mt = ev[(ev["kind"] == "matches") & ev["missing"].notna()].copy()
         if not mt.empty:
             expl = mt.explode("missing")
-            group_cols = (["uf", "municipio", "missing"] if (uf_f is None and mun_f is None) else ["missing"])
+            group_cols = (["ibge_mun", "missing"] if (uf_f is None and mun_f is None) else ["missing"])
             ranking_df = (expl.groupby(group_cols)
                             .size().reset_index(name="ocorrencias")
                             .sort_values("ocorrencias", ascending=False)
                             .head(int(topn)))
-            heat_source = expl.groupby(["uf", "municipio"]).size().reset_index(name="weight")
+            heat_source = expl.groupby(["ibge_uf", "ibge_mun"], dropna=False).size().reset_index(name="weight")
             heat_label = "Ocorrências"
 
     elif metric_code == "req_present":  # 2) Requisitos mais presentes
         mt = ev[(ev["kind"] == "matches") & ev["met"].notna()].copy()
         if not mt.empty:
             expl = mt.explode("met")
-            group_cols = (["uf", "municipio", "met"] if (uf_f is None and mun_f is None) else ["met"])
+            group_cols = (["ibge_mun", "met"] if (uf_f is None and mun_f is None) else ["met"])
             ranking_df = (expl.groupby(group_cols)
                             .size().reset_index(name="ocorrencias")
                             .sort_values("ocorrencias", ascending=False)
                             .head(int(topn)))
-            heat_source = expl.groupby(["uf", "municipio"]).size().reset_index(name="weight")
+            heat_source = expl.groupby(["ibge_uf", "ibge_mun"], dropna=False).size().reset_index(name="weight")
             heat_label = "Ocorrências"
 
     elif metric_code == "req_by_gender":  # 1) Requeridas por gênero (usamos 'view')
@@ -735,12 +876,12 @@ def page_observatorio():
         if not vw.empty:
             grp_cols = ["gender", "policy"]
             if uf_f is None and mun_f is None:
-                grp_cols = ["uf", "municipio", "gender", "policy"]
+                grp_cols = ["ibge_mun", "gender", "policy"]
             ranking_df = (vw.groupby(grp_cols)
                             .size().reset_index(name="requeridas")
                             .sort_values("requeridas", ascending=False)
                             .head(int(topn)))
-            heat_source = vw.groupby(["uf", "municipio"]).size().reset_index(name="weight")
+            heat_source = vw.groupby(["ibge_uf", "ibge_mun"], dropna=False).size().reset_index(name="weight")
             heat_label = "Requisições"
 
     else:  # "1) Políticas Mais Requeridas ... por Gênero" -> usamos 'view' com corte de gênero
@@ -749,15 +890,15 @@ def page_observatorio():
             # ranking por gênero + política
             grp_cols = ["gender", "policy"]
             if uf_f is None and mun_f is None:
-                grp_cols = ["uf", "municipio", "gender", "policy"]
+                grp_cols = ["ibge_mun", "gender", "policy"]
             ranking_df = vw.groupby(grp_cols).size().reset_index(name="requeridas").sort_values("requeridas", ascending=False).head(int(topn))
-            heat_source = vw.groupby(["uf", "municipio"]).size().reset_index(name="weight")
+            heat_source = vw.groupby(["ibge_uf", "ibge_mun"], dropna=False).size().reset_index(name="weight")
             heat_label = "Requisições"
 
     # --- Ranking (se houver) ---
     if ranking_df is not None and not ranking_df.empty:
         st.subheader("Ranking")
-        st.dataframe(ranking_df, use_container_width=True)
+        st.dataframe(_with_place_names(ranking_df), use_container_width=True, hide_index=True)
     else:
         st.caption("Sem dados para o ranking com os filtros/métrica escolhidos.")
 
@@ -768,7 +909,7 @@ def page_observatorio():
         # padrão: mostrar buscas
         srch = ev[ev["kind"] == "search"].copy()
         if not srch.empty:
-            base_for_map = srch.groupby(["uf", "municipio"]).size().reset_index(name="weight")
+            base_for_map = srch.groupby(["ibge_uf", "ibge_mun"], dropna=False).size().reset_index(name="weight")
             heat_label = "Buscas"
             defaulted_to_search = True
 
@@ -776,31 +917,30 @@ def page_observatorio():
         st.info("Sem dados georreferenciados para desenhar o mapa de calor.")
         footer(); return
 
-    # Preferimos coordenadas de município; senão, caímos para UF
-    use_mun = lat_mun and lon_mun and ("nome_mun" in mun_df.columns)
-    if use_mun:
-        mun_aux = mun_df.copy()
-        mun_aux["_key"] = mun_aux["nome_mun"].map(_normalize_text) + "||" + mun_aux["uf"].map(_normalize_text)
-        base_for_map["_key"] = base_for_map["municipio"].map(_normalize_text) + "||" + base_for_map["uf"].map(_normalize_text)
-        heat_df = base_for_map.merge(mun_aux[["_key", lat_mun, lon_mun, "nome_mun", "uf"]], on="_key", how="left").dropna(subset=[lat_mun, lon_mun])
+    # Preferimos coordenadas de município; senão, caímos para UF. A ligação é
+    # pelo código IBGE, com busca binária nos vetores montados em load_geo().
+    if geo_index.has_mun_coords:
+        base_mun = base_for_map.dropna(subset=["ibge_mun"])
+        lat, lon, found = geo_index.coords_mun(base_mun["ibge_mun"])
+        heat_df = _with_place_names(base_mun.assign(lat=lat, lon=lon, code=base_mun["ibge_mun"].astype(str)))[found]
+        heat_df = heat_df.rename(columns={"municipio": "nome_mun", "code": "ibge_mun"})
         tooltip_cfg = {
             "html": f"<b>Município:</b> {{nome_mun}} {{uf}}<br/><b>{heat_label}:</b> {{weight}}",
             "style": {"backgroundColor": "rgba(30,30,30,0.9)", "color": "white"},
         }
-        lon_col, lat_col = lon_mun, lat_mun
-    else:
-        if not (lat_uf and lon_uf and ("uf" in ufs_df.columns)):
-            st.info("Não encontrei lat/lon em `municipios.csv` nem `ufs.csv`. Inclua colunas lat/lon para habilitar o mapa.")
-            footer(); return
-        ufs_aux = ufs_df.copy()
-        ufs_aux["_key"] = ufs_aux["uf"].map(_normalize_text)
-        base_for_map["_key"] = base_for_map["uf"].map(_normalize_text)
-        heat_df = base_for_map.merge(ufs_aux[["_key", lat_uf, lon_uf, "uf"]], on="_key", how="left").dropna(subset=[lat_uf, lon_uf])
+    elif geo_index.has_uf_coords:
+        base_uf = base_for_map.dropna(subset=["ibge_uf"]).groupby("ibge_uf", as_index=False)["weight"].sum()
+        lat, lon, found = geo_index.coords_uf(base_uf["ibge_uf"])
+        uf_by_code = {c: uf for uf, c in geo_index.uf_code.items()}
+        heat_df = base_uf.assign(lat=lat, lon=lon, uf=base_uf["ibge_uf"].map(uf_by_code))[found]
         tooltip_cfg = {
             "html": f"<b>UF:</b> {{uf}}<br/><b>{heat_label}:</b> {{weight}}",
             "style": {"backgroundColor": "rgba(30,30,30,0.9)", "color": "white"},
         }
-        lon_col, lat_col = lon_uf, lat_uf
+    else:
+        st.info("Sem coordenadas em `municipios.csv`/`ufs.csv`. Rode `python build_geo.py` para gerar os centroides.")
+        footer(); return
+    lon_col, lat_col = "lon", "lat"
 
     # --- Heatmap (compatível com versões diferentes de pydeck) ---
     heat_layer = pdk.Layer(
@@ -816,16 +956,34 @@ def page_observatorio():
 
     initial_view_state = pdk.ViewState(latitude=-14.2350, longitude=-51.9253, zoom=3.5, pitch=0)
 
+    layers = [heat_layer]
+    # Limites dos municípios com eventos: a malha só é aberta aqui, e no nível
+    # de simplificação que o zoom pede.
+    store = geometry_store() if "ibge_mun" in heat_df.columns else None
+    if store is not None and st.checkbox("Mostrar limites dos municípios", value=False):
+        level = store.level_for_zoom(initial_view_state.zoom)
+        outlines = [{"ibge_mun": p["ibge_mun"], "polygon": ring}
+                    for p in store.polygons(heat_df["ibge_mun"], level) for ring in p["rings"]]
+        layers.append(pdk.Layer(
+            "PolygonLayer",
+            data=outlines,
+            get_polygon="polygon",
+            filled=False,
+            stroked=True,
+            get_line_color=[60, 60, 60, 160],
+            line_width_min_pixels=1,
+        ))
+
     try:
         r = pdk.Deck(
-            layers=[heat_layer],
+            layers=layers,
             initial_view_state=initial_view_state,
             tooltip=tooltip_cfg,  # type: ignore
             map_style="https://basemaps.cartocdn.com/gl/positron-gl-style/style.json",
         )
     except TypeError:
         r = pdk.Deck(
-            layers=[heat_layer],
+            layers=layers,
             initial_view_state=initial_view_state,
             map_style="https://basemaps.cartocdn.com/gl/positron-gl-style/style.json",
         )
@@ -839,41 +997,31 @@ def page_observatorio():
 
     footer()
 
-def page_policy_picker():
-    header_nav("Selecionar política", "Escolha uma política mapeada para verificar sua aderência ao seu perfil.")
-
+@fragment
+def picker_results():
+    """Busca, página de opções e cartão da política escolhida (reexecuta só este trecho)."""
+    leave_fragment_if_navigated("policy_picker")
     cols = st.columns([2, 2, 1])
     with cols[0]:
-        q = st.text_input("Buscar por nome/direitos/requisitos", value="").strip().lower()
+        q = st.text_input("Buscar por nome/direitos/requisitos", key="picker_q").strip().lower()
     with cols[1]:
         niveis = sorted(df["nivel"].dropna().unique().tolist()) if "nivel" in df.columns else []
         sel_niveis = st.multiselect("Filtrar por nível", options=niveis, default=[])
     with cols[2]:
-        limit = st.number_input("Qtd. itens", min_value=1, max_value=50, value=20, step=1)
+        limit = st.number_input("Opções por página", min_value=1, max_value=50, value=20, step=1)
+    suggestion_buttons("picker_q", q)
 
-    view = df.copy()
-    if sel_niveis and "nivel" in view.columns:
-        view = view[view["nivel"].isin(sel_niveis)]
-    if q:
-        def _contains(row):
-            campos = []
-            for c in ["Politicas publicas", "Descrição dos direitos", "Acesso", "Organização interna (Subprogramas e/ou Eixos)"]:
-                if c in row and pd.notna(row[c]):
-                    campos.append(str(row[c]).lower())
-            return q in " | ".join(campos)
-        view = view[view.apply(_contains, axis=1)]
-
-    nomes = view["Politicas publicas"].fillna("(sem título)").tolist() if "Politicas publicas" in view.columns else []
-    if not nomes:
+    view = search_view(q, sel_niveis)
+    if view.empty or "Politicas publicas" not in view.columns:
         st.info("Nenhuma política encontrado pelos filtros.")
-        st.button("← Voltar ao cadastro", use_container_width=True, on_click=lambda: goto("profile"))
         return
 
-    idx_map = {row["Politicas publicas"]: i for i, (_, row) in enumerate(view.iterrows()) if "Politicas publicas" in row}
-    sel_nome = st.selectbox("Escolha a política", options=nomes, index=0)
+    page = view.loc[paginate("picker", view.index, int(limit), (q, tuple(sel_niveis), int(limit)))]
+    nomes = page["Politicas publicas"].fillna("(sem título)").tolist()
+    pos = st.selectbox("Escolha a política", options=range(len(nomes)), format_func=nomes.__getitem__, index=0)
     st.caption("Dica: filtre pelo nível ou use a busca para agilizar.")
 
-    sel_row = view.iloc[idx_map.get(sel_nome, 0)]
+    sel_row = page.iloc[pos or 0]
     small_card(sel_row, selectable=False)
 
     def _pick_and_go():
@@ -886,7 +1034,7 @@ def page_policy_picker():
         try:
             log_event(kind="view",
                       policy=str(sel_row.get("Politicas publicas", "")),
-                      uf=uf, municipio=mun, gender=gender)
+                      uf=uf, municipio=mun, gender=gender, ibge_mun=current_ibge_mun())
         except Exception:
             pass
 
@@ -894,6 +1042,11 @@ def page_policy_picker():
 
     st.button("Analisar minha aderência a esta política", type="primary", use_container_width=True, on_click=_pick_and_go)
 
+def page_policy_picker():
+    header_nav("Selecionar política", "Escolha uma política mapeada para verificar sua aderência ao seu perfil.")
+
+    picker_results()
+
     st.divider()
     col_p1, col_p2 = st.columns([1, 2])
     with col_p1:
@@ -912,33 +1065,61 @@ def page_policy_picker():
     with c2:
         st.button("Voltar à apresentação", use_container_width=True, on_click=lambda: goto("home"))
 
-def page_matches():
-    header_nav("Políticas adequadas ao seu perfil", "Resultados com base no seu cadastro.")
+@fragment
+def matches_results():
+    """Listas de elegíveis/quase elegíveis, paginadas; trocar de página não reexecuta o app."""
+    leave_fragment_if_navigated("matches")
     eligible_rows = st.session_state.get("eligible", [])
     nearly_rows = st.session_state.get("nearly", [])
+    scores = st.session_state.get("scores", {})
+
+    st.selectbox(
+        "Políticas mostradas por lista",
+        options=TOP_N_OPTIONS,
+        index=TOP_N_OPTIONS.index(st.session_state.get("top_n", 20)),
+        key="top_n",
+        on_change=lambda: store_top_matches(st.session_state.profile),
+    )
+    counts = st.session_state.get("match_counts")
+    if counts:
+        st.caption(f"Exibindo {len(eligible_rows)} de {counts[0]} elegíveis e "
+                   f"{len(nearly_rows)} de {counts[1]} quase elegíveis.")
 
     st.markdown("### ✅ Elegíveis")
     if eligible_rows:
-        for idx, met, missing in eligible_rows:
+        for idx, met, missing in paginate("eligible", eligible_rows, signature=tuple(r[0] for r in eligible_rows)):
             r = df.loc[idx]
             def on_select(idx=idx):
                 st.session_state.selected_policy_idx = idx
                 goto("policy_detail")
-            small_card(r, met=met, missing=missing, selectable=True, on_select=on_select)
+            small_card(r, met=met, missing=missing, selectable=True, on_select=on_select, score=scores.get(idx))
     else:
         st.info("Nenhuma política 100% elegível encontrada com as regras atuais.")
 
     st.markdown("### 🟡 Quase elegíveis (o que falta)")
     if nearly_rows:
-        for idx, met, missing in nearly_rows:
+        # já ordenadas em store_top_matches: menos requisitos faltantes primeiro; empate: maior aderência
+        sugg = st.session_state.get("unlock", [])
+        if sugg:
+            with st.container(border=True):
+                st.write("🔑 **O que mais destravaria políticas para você:**")
+                for key, unlocked, blocking in sugg:
+                    label = kw_map[key].get("label", key)
+                    st.write(f"- **{label}** — libera {unlocked} política(s) de imediato; falta em {blocking}.")
+
+        for idx, met, missing in paginate("nearly", nearly_rows, signature=tuple(r[0] for r in nearly_rows)):
             r = df.loc[idx]
             def on_select(idx=idx):
                 st.session_state.selected_policy_idx = idx
                 goto("policy_detail")
-            small_card(r, met=met, missing=missing, selectable=True, on_select=on_select)
+            small_card(r, met=met, missing=missing, selectable=True, on_select=on_select, score=scores.get(idx))
     else:
         st.info("Nenhuma política parcialmente elegível encontrada com as regras atuais.")
 
+def page_matches():
+    header_nav("Políticas adequadas ao seu perfil", "Resultados com base no seu cadastro.")
+    matches_results()
+
     cols = st.columns(2)
     with cols[0]:
         st.button("← Editar perfil", use_container_width=True, on_click=lambda: goto("profile"))
@@ -968,8 +1149,7 @@ def page_policy_detail():
         return
 
     row = df.loc[sel_idx]
-    acesso = row.get("Acesso", "")
-    met, missing = evaluate_requirements(str(acesso), st.session_state.profile, kw_map)
+    met, missing = evaluate_policy(req_index, sel_idx, st.session_state.profile, kw_map)
 
     small_card(row, met=met, missing=missing, selectable=False)
 
@@ -0,0 +1,188 @@
+# batch_match.py
+# Casamento em lote, sem a interface: lê cadastros (CSV ou JSONL), avalia cada
+# perfil contra o catálogo e grava o resultado em JSONL, linha a linha.
+#
+# Uso:
+#   python batch_match.py cadastros.csv -o resultados.jsonl --workers 4
+#   cat cadastros.jsonl | python batch_match.py - --format jsonl > resultados.jsonl
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pandas as pd
+
+from catalog import read_catalog
+from utils import load_keyword_map, build_requirement_index, evaluate_batch
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "data", "politicas_publicas.xlsx")
+KW_PATH = os.path.join(BASE_DIR, "keyword_map.json")
+SCHEMA_PATH = os.path.join(BASE_DIR, "profile_schema.json")
+
+_TRUE = {"1", "true", "t", "sim", "s", "yes", "y", "x"}
+
+# Estado de cada processo trabalhador (carregado uma vez no initializer)
+_ENGINE = None
+
+def _coerce(value, t):
+    """Converte o texto lido do CSV/JSONL para o tipo do profile_schema."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if t == "bool":
+        return value if isinstance(value, bool) else str(value).strip().lower() in _TRUE
+    if t == "number":
+        try:
+            return float(str(value).replace(",", "."))
+        except ValueError:
+            return None
+    return value
+
+def _init_worker(data_path, kw_path, schema_path):
+    global _ENGINE
+    df = read_catalog(data_path)
+    kw_map = load_keyword_map(kw_path)
+    with open(schema_path, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    texts = df["Acesso"] if "Acesso" in df.columns else []
+    index = build_requirement_index(texts, kw_map)
+    names = df["Politicas publicas"].fillna("(sem título)").astype(str).to_dict() \
+        if "Politicas publicas" in df.columns else {}
+    _ENGINE = (index, kw_map, schema, names)
+
+def _match_chunk(chunk):
+    """
+    chunk: lista de (nº da linha, registro bruto, erro). Devolve as linhas JSONL
+    prontas; registros inválidos viram {"row", "id": null, "error"}.
+    """
+    index, kw_map, schema, names = _ENGINE
+    types = {field: spec.get("type", "text") for field, spec in schema.items()}
+    good = [rec for _, rec, err in chunk if err is None]
+    result = None
+    if good:
+        profiles = pd.DataFrame(
+            [{k: _coerce(v, types.get(k, "text")) for k, v in rec.items()} for rec in good],
+            dtype=object,
+        )
+        result = evaluate_batch(profiles, index, kw_map)
+    out = []
+    p = 0
+    for lineno, rec, err in chunk:
+        if err is not None:
+            out.append(json.dumps({"row": lineno, "id": None, "error": err}, ensure_ascii=False))
+            continue
+        eligible_rows, nearly_rows = result.rows(p)
+        p += 1
+        out.append(json.dumps({
+            "row": lineno,
+            "id": rec.get("id"),
+            "eligible": [{"idx": int(idx), "policy": names.get(idx, ""), "met": met}
+                         for idx, met, _missing in eligible_rows],
+            "nearly": [{"idx": int(idx), "policy": names.get(idx, ""), "met": met, "missing": missing}
+                       for idx, met, missing in nearly_rows],
+        }, ensure_ascii=False))
+    return out
+
+def _read_records(fh, fmt):
+    """
+    (nº da linha, registro, erro). Uma linha JSONL inválida ou que não seja
+    objeto não interrompe o lote: vai com o erro (e registro vazio), é
+    avisada no stderr e segue para a próxima.
+    """
+    if fmt == "csv":
+        for i, rec in enumerate(csv.DictReader(fh), start=1):
+            yield i, rec, None
+    else:
+        for i, line in enumerate(fh, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError as e:
+                err = f"JSON inválido: {e}"
+            else:
+                if isinstance(rec, dict):
+                    yield i, rec, None
+                    continue
+                err = f"esperava um objeto JSON, veio {type(rec).__name__}"
+            print(f"⚠ linha {i}: {err}", file=sys.stderr)
+            yield i, {}, err
+
+def _chunks(records, size):
+    it = iter(records)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def run(fh_in, fh_out, fmt, workers, chunk_size, data_path=DATA_PATH, kw_path=KW_PATH, schema_path=SCHEMA_PATH):
+    """
+    Processa a entrada em blocos com um pool de processos. No máximo
+    2 x workers blocos ficam em memória; a saída sai na ordem da entrada.
+    Devolve (linhas gravadas, registros inválidos, segundos).
+    """
+    total = 0
+    errors = [0]
+    t0 = time.perf_counter()
+
+    def records():
+        for rec in _read_records(fh_in, fmt):
+            errors[0] += rec[2] is not None
+            yield rec
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(data_path, kw_path, schema_path)) as pool:
+        pending = deque()
+        for chunk in _chunks(records(), chunk_size):
+            pending.append(pool.submit(_match_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                lines = pending.popleft().result()
+                fh_out.write("\n".join(lines) + "\n")
+                total += len(lines)
+        while pending:
+            lines = pending.popleft().result()
+            fh_out.write("\n".join(lines) + "\n")
+            total += len(lines)
+    fh_out.flush()
+    return total, errors[0], time.perf_counter() - t0
+
+def main():
+    parser = argparse.ArgumentParser(description="Casamento em lote de perfis x políticas (saída JSONL).")
+    parser.add_argument("input", help="arquivo CSV/JSONL de cadastros ('-' para stdin)")
+    parser.add_argument("-o", "--output", default="-", help="arquivo JSONL de saída ('-' para stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="formato da entrada (padrão: pela extensão)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processos no pool")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="perfis por bloco enviado a cada processo")
+    parser.add_argument("--data", default=DATA_PATH, help="planilha de políticas")
+    parser.add_argument("--keywords", default=KW_PATH, help="keyword_map.json")
+    parser.add_argument("--schema", default=SCHEMA_PATH, help="profile_schema.json")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    fh_in = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    fh_out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        total, errors, elapsed = run(fh_in, fh_out, fmt, max(1, args.workers), max(1, args.chunk_size),
+                             args.data, args.keywords, args.schema)
+    finally:
+        if fh_in is not sys.stdin:
+            fh_in.close()
+        if fh_out is not sys.stdout:
+            fh_out.close()
+
+    rate = total / elapsed if elapsed else 0.0
+    print(f"✔ {total} perfis em {elapsed:.1f}s ({rate:,.0f} perfis/s) com {args.workers} processo(s)",
+          file=sys.stderr)
+    if errors:
+        print(f"⚠ {errors} registro(s) inválido(s) gravado(s) com \"error\" na saída", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,572 @@
+# bench.py
+# Micro-benchmarks dos caminhos quentes do recomendador.
+# Uso: python bench.py <cenario> [opções]   (python bench.py -h lista os cenários)
+
+import argparse
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import unicodedata
+
+import pandas as pd
+
+from catalog import read_catalog
+from engine import SEARCH_COLS
+from search import SearchIndex, Autocomplete, autocomplete_entries
+from textnorm import norm, norm_series
+from utils import (
+    load_keyword_map, evaluate_requirements, build_requirement_index, match_profile, evaluate_batch,
+    EligibilityState, profile_mask, top_matches_split, unlock_suggestions, RuleGraph, _NUM_OPS,
+)
+
+DATA_PATH = os.path.join("data", "politicas_publicas.xlsx")
+KW_PATH = "keyword_map.json"
+
+def _timeit(fn, repeat=1):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return (time.perf_counter() - t0) / repeat, out
+
+def _load_catalog():
+    return read_catalog(DATA_PATH)
+
+def _random_profiles(n, seed=42):
+    rnd = random.Random(seed)
+    atividades = ["pescador artesanal", "pescadora artesanal", "aquicultor(a)", "marisqueiro(a)",
+                  "agricultor(a) familiar", "empreendedor(a)", "estudante", "outro"]
+    rows = []
+    for _ in range(n):
+        rows.append({
+            "atividade": rnd.choice(atividades),
+            "renda_mensal_sm": float(rnd.randint(0, 6)),
+            "registro_rgp": rnd.random() < 0.5,
+            "cadunico": rnd.random() < 0.5,
+            "cpf": rnd.random() < 0.9,
+            "cnpj": rnd.random() < 0.2,
+            "associado": rnd.random() < 0.5,
+            "mulher": rnd.random() < 0.5,
+            "juventude": rnd.random() < 0.3,
+            "pessoa_com_deficiencia": rnd.random() < 0.1,
+        })
+    return rows
+
+def bench_batch(args):
+    """Elegibilidade em lote: evaluate_requirements por par, match_profile por perfil e evaluate_batch."""
+    df = _load_catalog()
+    kw_map = load_keyword_map(KW_PATH)
+    index = build_requirement_index(df["Acesso"].items(), kw_map)
+    profiles = _random_profiles(args.n)
+    # campos numéricos ausentes ou inválidos: o lote tem de tratá-los como o caminho escalar
+    profiles[:4] = [dict(profiles[0], renda_mensal_sm=v) for v in (None, "abc", "", float("nan"))]
+    table = pd.DataFrame(profiles)
+    acessos = [(idx, str(a)) for idx, a in df["Acesso"].items() if a]
+
+    def per_pair():
+        for p in profiles:
+            for _, a in acessos:
+                evaluate_requirements(a, p, kw_map)
+
+    t_pair, _ = _timeit(per_pair)
+    t_scalar, scalar = _timeit(lambda: [match_profile(index, p, kw_map) for p in profiles])
+    t_batch, batch = _timeit(lambda: evaluate_batch(table, index, kw_map))
+
+    assert all(batch.rows(i) == scalar[i] for i in range(len(profiles))), "resultado divergente"
+    # todos os operadores numéricos, inclusive os que o keyword_map atual não usa
+    edge = {"renda": [None, "abc", "", float("nan"), 0, 1, 2.5, "3"]}
+    ops = {f"r{op}": {"field": "renda", "type": "number", "op": op, "value": 1} for op in _NUM_OPS}
+    ops["entre"] = {"field": "renda", "type": "number", "op": "between", "value": [1, 3]}
+    graph = RuleGraph(ops)
+    frame = graph.bind_frame(pd.DataFrame(edge))
+    for i, v in enumerate(edge["renda"]):
+        one = graph.bind({"renda": v})
+        assert all(bool(frame(k)[i]) == one(k) for k in ops), f"operador divergente para renda={v!r}"
+    print(f"{args.n} perfis x {len(index)} políticas")
+    print(f"  por par : {t_pair * 1000:9.1f} ms")
+    print(f"  perfil  : {t_scalar * 1000:9.1f} ms")
+    print(f"  lote    : {t_batch * 1000:9.1f} ms  ({t_pair / t_batch:.0f}x / {t_scalar / t_batch:.0f}x)")
+
+def bench_whatif(args):
+    """Simulação "e se": EligibilityState.update x match_profile completo, catálogo replicado."""
+    df = _load_catalog()
+    big = pd.concat([df] * args.scale, ignore_index=True)
+    kw_map = load_keyword_map(KW_PATH)
+    index = build_requirement_index(big["Acesso"], kw_map)
+    profile = _random_profiles(1)[0]
+    state = EligibilityState(index, kw_map, profile)
+
+    rnd = random.Random(7)
+    choices = {
+        "cadunico": [True, False], "registro_rgp": [True, False], "associado": [True, False],
+        "cnpj": [True, False], "mulher": [True, False], "renda_mensal_sm": [0.0, 2.0, 3.0, 5.0],
+        "atividade": ["pescador artesanal", "aquicultor(a)", "outro"],
+    }
+    times = []
+    for _ in range(args.steps):
+        field = rnd.choice(list(choices))
+        value = rnd.choice(choices[field])
+        t0 = time.perf_counter()
+        state.update(field, value)
+        times.append(time.perf_counter() - t0)
+    t_full, _ = _timeit(lambda: match_profile(index, state.profile, kw_map))
+
+    times.sort()
+    print(f"{len(index)} políticas mapeadas ({args.scale}x a planilha), {args.steps} alterações")
+    print(f"  update médio  : {sum(times) / len(times) * 1000:7.2f} ms")
+    print(f"  update p99    : {times[int(len(times) * 0.99)] * 1000:7.2f} ms")
+    print(f"  update máximo : {times[-1] * 1000:7.2f} ms")
+    print(f"  match completo: {t_full * 1000:7.2f} ms")
+
+def bench_rank(args):
+    """Listas da página de resultados (top_matches_split) e sugestões de desbloqueio, catálogo replicado."""
+    df = _load_catalog()
+    big = pd.concat([df] * args.scale, ignore_index=True)
+    kw_map = load_keyword_map(KW_PATH)
+    index = build_requirement_index(big["Acesso"], kw_map)
+    profiles = _random_profiles(args.n)
+
+    t_top, _ = _timeit(lambda: [top_matches_split(index, p, kw_map, 20) for p in profiles])
+    t_mask, masks = _timeit(lambda: [profile_mask(index, p) for p in profiles])
+    t_sugg, _ = _timeit(lambda: [unlock_suggestions(index, m, top=3) for m in masks])
+    print(f"{len(index)} políticas mapeadas ({args.scale}x a planilha), {args.n} perfis")
+    print(f"  top_matches_split  : {t_top / args.n * 1000:7.3f} ms/perfil (20 de cada lista)")
+    print(f"  profile_mask       : {t_mask / args.n * 1000:7.3f} ms/perfil")
+    print(f"  unlock_suggestions : {t_sugg / args.n * 1000:7.3f} ms/perfil")
+
+def bench_search(args):
+    """Busca de políticas: varredura com str.contains x índice invertido + BM25, catálogo replicado."""
+    df = _load_catalog()
+    queries = ["pescador", "Pescadór artesanal", "agricultura familiar", "renda", "cpf cnpj", "seguro defeso"]
+    print(f"{'políticas':>10} {'montagem':>10} {'varredura':>11} {'índice':>9}")
+    for scale in args.scales:
+        big = pd.concat([df] * scale, ignore_index=True)
+        text = pd.DataFrame({c: norm_series(big[c]) for c in SEARCH_COLS if c in big.columns})
+        t_build, index = _timeit(lambda: SearchIndex(text, big["nivel"] if "nivel" in big.columns else None))
+
+        def scan():
+            for q in queries:
+                mask = pd.Series(False, index=text.index)
+                for c in text.columns:
+                    mask |= text[c].str.contains(norm(q), regex=False)
+
+        t_scan, _ = _timeit(scan)
+        t_index, _ = _timeit(lambda: [index.search(q) for q in queries], repeat=5)
+        n = len(queries)
+        print(f"{len(big):>10} {t_build * 1000:>8.0f}ms {t_scan / n * 1000:>9.2f}ms {t_index / n * 1000:>7.2f}ms")
+
+def bench_suggest(args):
+    """Autocompletar: montagem e latência de suggest() por tamanho de prefixo."""
+    df = _load_catalog()
+    kw_map = load_keyword_map(KW_PATH)
+    index = build_requirement_index(df["Acesso"], kw_map)
+    entries = autocomplete_entries(df, kw_map, index.policy_keys)
+    # nomes sintéticos para simular um catálogo maior
+    rnd = random.Random(3)
+    words = sorted({w for d, _k, _w in entries for w in d.split() if len(w) > 3})
+    entries += [(" ".join(rnd.sample(words, 4)), "política", 1.0) for _ in range(args.extra)]
+    t_build, ac = _timeit(lambda: Autocomplete(entries))
+    print(f"{len(ac.items)} sugestões possíveis • montagem {t_build * 1000:.0f} ms")
+    for n in (1, 2, 3, 5):
+        prefixes = [w[:n] for w in rnd.choices(words, k=2000)]
+        t, _ = _timeit(lambda: [ac.suggest(p) for p in prefixes])
+        print(f"  prefixo de {n} letra(s): {t / len(prefixes) * 1e6:7.1f} µs")
+
+def bench_geom(args):
+    """Malha municipal: json.load do GeoJSON x abrir o .mgeo (memmap) e consultar alguns municípios."""
+    import json
+    import tracemalloc
+    import numpy as np
+    from geostore import GeometryStore, write_store
+
+    rnd = random.Random(0)
+    ang = np.linspace(0, 2 * np.pi, args.points, endpoint=False)
+    feats = {}
+    for k in range(args.n):
+        cx, cy = rnd.uniform(-70, -35), rnd.uniform(-30, 3)
+        r = 0.1 + 0.02 * np.sin(ang * 7) + np.random.default_rng(k).uniform(-0.003, 0.003, args.points)
+        ring = np.c_[cx + r * np.cos(ang), cy + r * np.sin(ang)].tolist()
+        feats[str(1100000 + k)] = {"type": "Polygon", "coordinates": [ring + ring[:1]]}
+    with tempfile.TemporaryDirectory() as tmp:
+        gj_path, store_path = os.path.join(tmp, "m.geojson"), os.path.join(tmp, "m.mgeo")
+        with open(gj_path, "w") as f:
+            json.dump({"type": "FeatureCollection", "features": [
+                {"type": "Feature", "properties": {"codarea": c}, "geometry": g} for c, g in feats.items()]}, f)
+        stats = write_store(feats.items(), store_path)
+
+        tracemalloc.start()
+        t_open, store = _timeit(lambda: GeometryStore(store_path))
+        mem_open = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        tracemalloc.start()
+        t_json, _ = _timeit(lambda: json.load(open(gj_path, encoding="utf-8")))
+        mem_json = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        codes = rnd.sample(sorted(feats), 50)
+        t_query, _ = _timeit(lambda: store.polygons(codes, store.level_for_zoom(3.5)), repeat=20)
+
+        print(f"{args.n} municípios x {args.points} pontos")
+        print(f"  GeoJSON   : {os.path.getsize(gj_path) / 1e6:7.1f} MB  json.load {t_json * 1000:8.0f} ms  pico {mem_json / 1e6:7.1f} MB")
+        print(f"  .mgeo     : {stats['bytes'] / 1e6:7.1f} MB  abrir     {t_open * 1000:8.2f} ms  pico {mem_open / 1e6:7.3f} MB")
+        print(f"  50 municípios (nível do zoom 3.5): {t_query * 1000:.2f} ms")
+
+def bench_fetch(args):
+    """Atualização da malha do IBGE contra o servidor local (ibge_stub): sequencial x paralelo x cache."""
+    import fetch_ibge_geo
+    from ibge_stub import StubIBGE
+
+    stub = StubIBGE(delay=args.delay).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # a 3ª rodada reaproveita o diretório (e o cache HTTP) da 2ª
+            for label, workers, sub in (("frio, 1 conexão", 1, "seq"), (f"frio, {args.workers} conexões", args.workers, "par"),
+                                        (f"com cache (304), {args.workers}", args.workers, "par")):
+                geo_dir = os.path.join(tmp, sub)
+                s = fetch_ibge_geo.run(stub.base_url, geo_dir, workers)
+                changed = "reescreveu" if s["municipios_changed"] else "sem mudança"
+                print(f"  {label:<22}: {s['seconds'] * 1000:7.0f} ms  "
+                      f"({s['http_200']} downloads, {s['http_304']} x 304, CSV {changed})")
+    finally:
+        stub.stop()
+
+def bench_coldstart(args):
+    """Partida a frio do catálogo (processo novo): Excel via openpyxl x snapshot compilado."""
+    # mede só o load_catalog (pandas já importado); openpyxl só é importado se precisar ler o Excel
+    code = ("import sys, time; from catalog import load_catalog; t0 = time.perf_counter(); "
+            "load_catalog(sys.argv[1], sys.argv[2]); print(time.perf_counter() - t0)")
+
+    def run(cache_dir):
+        out = subprocess.run([sys.executable, "-c", code, DATA_PATH, cache_dir],
+                             capture_output=True, text=True, check=True)
+        return float(out.stdout.strip())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        without = []
+        for i in range(args.repeat):
+            without.append(run(os.path.join(tmp, f"vazio{i}")))  # diretório novo: sem snapshot
+        run(os.path.join(tmp, "snap"))  # gera o snapshot
+        with_snap = [run(os.path.join(tmp, "snap")) for _ in range(args.repeat)]
+    best_without, best_with = min(without), min(with_snap)
+    print(f"carregar catálogo em processo novo (melhor de {args.repeat}):")
+    print(f"  sem snapshot : {best_without * 1000:8.1f} ms")
+    print(f"  com snapshot : {best_with * 1000:8.1f} ms  ({best_without / best_with:.1f}x)")
+
+def bench_boot(args):
+    """Custo por rerun do boot do banco: 4 funções de migração x bootstrap_db (já aplicado)."""
+    import db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "boot.db")
+        db.bootstrap_db()
+        now = "2024-01-01T00:00:00"
+        with db._conn() as cn:
+            cn.executemany(
+                "INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at) VALUES (?, ?, 1, ?, ?)",
+                [(f"u{i}", "{}", now, now) for i in range(args.profiles)],
+            )
+
+        def legacy():
+            db.init_db(); db.migrate_db(); db.migrate_accounts(); db.migrate_analytics()
+
+        t_old, _ = _timeit(legacy, repeat=args.repeat)
+        t_new, _ = _timeit(db.bootstrap_db, repeat=args.repeat)
+    print(f"{args.profiles} perfis no banco, média de {args.repeat} reruns")
+    print(f"  migrações a cada rerun : {t_old * 1000:9.3f} ms")
+    print(f"  bootstrap_db           : {t_new * 1000:9.3f} ms")
+
+def bench_db(args):
+    """Conexões SQLite: conexão nova por chamada (antes) x pool de db.py, com 1 e N threads."""
+    import sqlite3
+    import threading
+    import db
+
+    opened = [0]
+
+    def legacy_conn():
+        # _conn() original: connect + 3 PRAGMAs a cada chamada, sem fechar
+        opened[0] += 1
+        cn = sqlite3.connect(db.DB_PATH, check_same_thread=False)
+        cn.execute("PRAGMA journal_mode=WAL;")
+        cn.execute("PRAGMA synchronous=NORMAL;")
+        cn.execute("PRAGMA foreign_keys=ON;")
+        return cn
+
+    def workload(ops, seed):
+        rnd = random.Random(seed)
+        for _ in range(ops):
+            r = rnd.random()
+            if r < 0.6:
+                db.load_profile(rnd.randint(1, args.profiles))
+            elif r < 0.9:
+                db.get_profiles_by_account(rnd.randint(1, 50))
+            else:
+                db.update_profile(rnd.randint(1, args.profiles), {"renda_mensal_sm": rnd.randint(0, 5)})
+
+    def run(threads):
+        per = args.ops // threads
+        ts = [threading.Thread(target=workload, args=(per, i)) for i in range(threads)]
+        t0 = time.perf_counter()
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        return (time.perf_counter() - t0) / (per * threads)
+
+    pooled_conn, pooled_read = db._conn, db._read_conn
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "pool.db")
+        db.bootstrap_db()
+        now = "2024-01-01T00:00:00"
+        with db._conn() as cn:
+            cn.executemany(
+                "INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at, owner_account_id)"
+                " VALUES (?, '{}', 1, ?, ?, ?)",
+                [(f"u{i}", now, now, i % 50 + 1) for i in range(args.profiles)],
+            )
+        print(f"{args.ops} operações (60% load_profile, 30% get_profiles_by_account, 10% update_profile)")
+        for threads in (1, args.threads):
+            db._conn = db._read_conn = legacy_conn
+            opened[0] = 0
+            try:
+                t_old = run(threads)
+            finally:
+                db._conn, db._read_conn = pooled_conn, pooled_read
+            old_opens = opened[0]
+            db.close_pools()
+            t_new = run(threads)
+            new_opens = sum(s["opened"] for s in db.pool_stats().values())
+            print(f"  {threads} thread(s):")
+            print(f"    conexão por chamada : {t_old * 1e6:8.1f} µs/op  {old_opens:6d} conexões abertas")
+            print(f"    pool                : {t_new * 1e6:8.1f} µs/op  {new_opens:6d} conexões abertas  "
+                  f"({t_old / t_new:.1f}x)")
+        db.close_pools()
+
+def bench_events(args):
+    """Eventos do Observatório: INSERT + commit por evento x fila com gravação em lote (db.EventWriter)."""
+    import threading
+    import db
+
+    def click(n, seed):
+        # um clique em "ver políticas": 1 evento 'matches' + 1 'eligible' por política elegível
+        db.log_event(kind="matches", uf="SP", municipio="Campinas", gender="mulher", met=["rgp"], missing=["cnpj"],
+                     extras={"eligible_cnt": n})
+        for i in range(n):
+            db.log_event(kind="eligible", policy=f"Política {seed}-{i}", uf="SP", municipio="Campinas", gender="mulher")
+
+    def run(threads):
+        per = args.clicks // threads
+        lat = []
+        lock = threading.Lock()
+
+        def worker(k):
+            mine = []
+            for c in range(per):
+                t0 = time.perf_counter()
+                click(args.eligible, k * per + c)
+                mine.append(time.perf_counter() - t0)
+            with lock:
+                lat.extend(mine)
+
+        ts = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+        t0 = time.perf_counter()
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        db.flush_events(timeout=None)
+        total = time.perf_counter() - t0
+        lat.sort()
+        return total, lat[len(lat) // 2], lat[int(len(lat) * 0.99) - 1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "events.db")
+        db.bootstrap_db()
+        db._geo()  # índice geográfico fora da medição
+        n_events = args.clicks * (args.eligible + 1)
+        print(f"{args.clicks} cliques x {args.eligible + 1} eventos = {n_events} eventos")
+        for threads in (1, args.threads):
+            results = {}
+            for label, async_ in (("INSERT por evento", False), ("fila + lote", True)):
+                db.ASYNC_EVENTS = async_
+                results[label] = run(threads)
+            print(f"  {threads} thread(s):")
+            base = results["INSERT por evento"][0]
+            for label, (total, p50, p99) in results.items():
+                print(f"    {label:<18}: {n_events / total:9.0f} eventos/s  clique p50 {p50 * 1000:7.2f} ms  "
+                      f"p99 {p99 * 1000:7.2f} ms  ({base / total:.1f}x)")
+        with db._conn() as cn:
+            stored = cn.execute("SELECT COUNT(*) FROM analytics_events").fetchone()[0]
+        print(f"  gravados: {stored}  contadores: {db.event_stats()}")
+        db.close_pools()
+
+def bench_index(args):
+    """Índices da migração 6 com N eventos: consultas do Observatório e de perfis sem x com índice + plano."""
+    import db
+    from datetime import datetime, timedelta
+
+    rnd = random.Random(7)
+    end = datetime(2024, 12, 31)
+    kinds = ["search", "view", "matches", "eligible"]
+    terms = [f"termo {i}" for i in range(300)]
+
+    def events(n):
+        for _ in range(n):
+            uf = rnd.randint(11, 53)
+            kind = rnd.choice(kinds)
+            ts = (end - timedelta(seconds=rnd.randint(0, 365 * 86400))).isoformat()
+            yield (ts, kind, f"Política {rnd.randint(1, 500)}", None, None,
+                   rnd.choice(terms) if kind == "search" else None, rnd.choice(["mulher", "homem", None]),
+                   None, None, None, uf, uf * 100_000 + rnd.randint(0, 300))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "index.db")
+        db.bootstrap_db()
+        t_fill = time.perf_counter()
+        with db._conn() as cn:
+            cn.executemany(db._EVENT_SQL, events(args.rows))
+            now = end.isoformat()
+            cn.executemany(
+                "INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at, owner_account_id)"
+                " VALUES (?, '{}', ?, ?, ?, ?)",
+                ((f"u{i % 20_000}", i // 20_000 + 1, now, now, i % 20_000 + 1) for i in range(args.profiles)),
+            )
+            for name in db.INDEXES:
+                cn.execute(f"DROP INDEX IF EXISTS {name}")
+        print(f"{args.rows} eventos e {args.profiles} perfis gerados em {time.perf_counter() - t_fill:.1f}s")
+
+        def last_version(owner):
+            # a mesma consulta de save_profile_for_account, sem gravar
+            with db._read_conn() as cn:
+                return cn.execute(db._SQL_LAST_VERSION_BY_ACCOUNT, (owner,)).fetchone()[0]
+
+        day = (end - timedelta(days=1)).isoformat()
+        week = (end - timedelta(days=7)).isoformat()
+        cases = [
+            ("analytics: último dia", lambda: db.get_analytics(day, end.isoformat())),
+            ("analytics: UF, 7 dias", lambda: db.get_analytics(week, end.isoformat(), ibge_uf=35)),
+            ("analytics: município, ano", lambda: db.get_analytics(ibge_uf=35, ibge_mun=3500042)),
+            ("termos mais buscados", lambda: db.search_term_counts()),
+            ("perfis da conta", lambda: db.get_profiles_by_account(123)),
+            ("última versão (MAX)", lambda: last_version(123)),
+        ]
+        before = {name: _timeit(fn, repeat=args.repeat)[0] for name, fn in cases}
+        t_idx, _ = _timeit(db.migrate_indexes)
+        after = {name: _timeit(fn, repeat=args.repeat)[0] for name, fn in cases}
+        print(f"  criar os {len(db.INDEXES)} índices: {t_idx:.1f}s  (média de {args.repeat} execuções por consulta)")
+        for name, _fn in cases:
+            print(f"  {name:<26}: {before[name] * 1000:9.2f} ms -> {after[name] * 1000:8.2f} ms  "
+                  f"({before[name] / after[name]:.0f}x)")
+
+        bad = [c for c in db.check_query_plans() if not c["ok"]]
+        for c in bad:
+            print(f"  ✘ {c['name']}: esperava {c['index']}, plano {c['plan']}")
+        db.close_pools()
+    if bad:
+        sys.exit(1)
+    print("  ✔ EXPLAIN QUERY PLAN usa os índices esperados em todas as consultas")
+
+def _norm_legacy(s):
+    """utils.norm original (NFD por caractere + duas regex), para comparação."""
+    if s is None:
+        return ""
+    s = str(s).lower()
+    s = "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
+    s = re.sub(r"[^a-z0-9\s\-_/]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+def bench_norm(args):
+    """Normalização de texto: norm original x textnorm (unitário, cache e lote)."""
+    df = _load_catalog()
+    texts = [str(v) for col in df.columns for v in df[col].tolist()] * args.repeat
+    short = [t[:40] for t in texts]
+    series = pd.Series(texts)
+
+    assert [norm(t) for t in texts] == [_norm_legacy(t) for t in texts], "resultado divergente"
+    t_old, _ = _timeit(lambda: [_norm_legacy(t) for t in texts])
+    t_new, _ = _timeit(lambda: [norm(t) for t in texts])
+    t_old_s, _ = _timeit(lambda: [_norm_legacy(t) for t in short])
+    t_new_s, _ = _timeit(lambda: [norm(t) for t in short])
+    t_ser, _ = _timeit(lambda: norm_series(series))
+    print(f"{len(texts)} textos da planilha")
+    print(f"  original      : {t_old * 1000:8.1f} ms")
+    print(f"  norm          : {t_new * 1000:8.1f} ms  ({t_old / t_new:.1f}x)")
+    print(f"  curtos orig.  : {t_old_s * 1000:8.1f} ms")
+    print(f"  curtos (LRU)  : {t_new_s * 1000:8.1f} ms  ({t_old_s / t_new_s:.1f}x)")
+    print(f"  norm_series   : {t_ser * 1000:8.1f} ms  ({t_old / t_ser:.1f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="cenario", required=True)
+
+    p = sub.add_parser("batch", help=bench_batch.__doc__)
+    p.add_argument("-n", type=int, default=10_000, help="quantidade de perfis")
+    p.set_defaults(func=bench_batch)
+
+    p = sub.add_parser("norm", help=bench_norm.__doc__)
+    p.add_argument("--repeat", type=int, default=20, help="quantas vezes replicar os textos da planilha")
+    p.set_defaults(func=bench_norm)
+
+    p = sub.add_parser("whatif", help=bench_whatif.__doc__)
+    p.add_argument("--scale", type=int, default=100, help="quantas cópias da planilha")
+    p.add_argument("--steps", type=int, default=500, help="quantidade de alterações simuladas")
+    p.set_defaults(func=bench_whatif)
+
+    p = sub.add_parser("rank", help=bench_rank.__doc__)
+    p.add_argument("--scale", type=int, default=100, help="quantas cópias da planilha")
+    p.add_argument("-n", type=int, default=200, help="quantidade de perfis")
+    p.set_defaults(func=bench_rank)
+
+    p = sub.add_parser("search", help=bench_search.__doc__)
+    p.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100, 500], help="cópias da planilha")
+    p.set_defaults(func=bench_search)
+
+    p = sub.add_parser("suggest", help=bench_suggest.__doc__)
+    p.add_argument("--extra", type=int, default=20_000, help="nomes sintéticos acrescentados")
+    p.set_defaults(func=bench_suggest)
+
+    p = sub.add_parser("geom", help=bench_geom.__doc__)
+    p.add_argument("-n", type=int, default=5570, help="municípios sintéticos")
+    p.add_argument("--points", type=int, default=200, help="pontos por polígono")
+    p.set_defaults(func=bench_geom)
+
+    p = sub.add_parser("fetch", help=bench_fetch.__doc__)
+    p.add_argument("--delay", type=float, default=0.1, help="latência simulada por requisição (s)")
+    p.add_argument("--workers", type=int, default=8, help="requisições simultâneas")
+    p.set_defaults(func=bench_fetch)
+
+    p = sub.add_parser("db", help=bench_db.__doc__)
+    p.add_argument("--ops", type=int, default=20_000, help="operações por cenário")
+    p.add_argument("--threads", type=int, default=8, help="threads no cenário concorrente")
+    p.add_argument("--profiles", type=int, default=5_000, help="perfis inseridos no banco de teste")
+    p.set_defaults(func=bench_db)
+
+    p = sub.add_parser("events", help=bench_events.__doc__)
+    p.add_argument("--clicks", type=int, default=200, help="cliques simulados por cenário")
+    p.add_argument("--eligible", type=int, default=30, help="políticas elegíveis por clique")
+    p.add_argument("--threads", type=int, default=8, help="sessões simultâneas no cenário concorrente")
+    p.set_defaults(func=bench_events)
+
+    p = sub.add_parser("index", help=bench_index.__doc__)
+    p.add_argument("--rows", type=int, default=1_000_000, help="eventos de analytics no banco de teste")
+    p.add_argument("--profiles", type=int, default=100_000, help="perfis no banco de teste")
+    p.add_argument("--repeat", type=int, default=5, help="execuções medidas por consulta")
+    p.set_defaults(func=bench_index)
+
+    p = sub.add_parser("coldstart", help=bench_coldstart.__doc__)
+    p.add_argument("--repeat", type=int, default=5, help="execuções de cada caso")
+    p.set_defaults(func=bench_coldstart)
+
+    p = sub.add_parser("boot", help=bench_boot.__doc__)
+    p.add_argument("--profiles", type=int, default=10_000, help="perfis inseridos no banco de teste")
+    p.add_argument("--repeat", type=int, default=20, help="reruns medidos")
+    p.set_defaults(func=bench_boot)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
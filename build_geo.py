@@ -0,0 +1,160 @@
+# build_geo.py
+# Acrescenta centroides (lat/lon) a data/geo/municipios.csv e data/geo/ufs.csv,
+# para o mapa do Observatório. Rode depois de fetch_ibge_geo.py.
+#
+# Fontes (uma delas):
+#   python build_geo.py --geojson data/geo/municipios_simplificado.geojson
+#   python build_geo.py --coords coordenadas.csv      (colunas: código IBGE + lat/lon)
+#
+# O centroide de cada município é o centro de massa dos polígonos; o de cada
+# UF é a média dos centroides dos municípios, ponderada pela área.
+# Com --geojson também grava a malha compacta data/geo/municipios.mgeo
+# (geostore.py), que o mapa carrega sob demanda (--no-store para pular).
+
+import argparse
+import json
+import os
+from typing import Dict, Tuple
+
+import pandas as pd
+
+from geo import guess_latlon_cols
+from geostore import write_store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GEO_DIR = os.path.join(BASE_DIR, "data", "geo")
+
+# nomes usuais da propriedade com o código do município nas malhas do IBGE e afins
+CODE_PROPS = ("ibge_mun", "codarea", "CD_MUN", "cd_mun", "CD_GEOCMU", "geocodigo", "cod_ibge", "id")
+
+def _ring_centroid(ring) -> Tuple[float, float, float]:
+    """(área com sinal, cx, cy) de um anel [[lon, lat], ...] pela fórmula do laço."""
+    a = cx = cy = 0.0
+    for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]):
+        cross = x0 * y1 - x1 * y0
+        a += cross
+        cx += (x0 + x1) * cross
+        cy += (y0 + y1) * cross
+    a *= 0.5
+    if a == 0:
+        n = len(ring) or 1
+        return 0.0, sum(p[0] for p in ring) / n, sum(p[1] for p in ring) / n
+    return a, cx / (6 * a), cy / (6 * a)
+
+def geometry_centroid(geom) -> Tuple[float, float, float]:
+    """(área, lon, lat) de um Polygon/MultiPolygon GeoJSON; buracos descontam área."""
+    polys = geom["coordinates"] if geom["type"] == "MultiPolygon" else [geom["coordinates"]]
+    total = sx = sy = 0.0
+    fallback = None
+    for poly in polys:
+        for k, ring in enumerate(poly):
+            ring = [tuple(p[:2]) for p in ring]
+            if len(ring) > 1 and ring[0] == ring[-1]:
+                ring = ring[:-1]
+            if not ring:
+                continue
+            a, cx, cy = _ring_centroid(ring)
+            a = abs(a) if k == 0 else -abs(a)  # anel externo soma, buracos subtraem
+            total += a
+            sx += a * cx
+            sy += a * cy
+            if fallback is None:
+                fallback = (cx, cy)
+    if total == 0:
+        return 0.0, *(fallback or (float("nan"), float("nan")))
+    return total, sx / total, sy / total
+
+def _feature_code(feat) -> str:
+    props = feat.get("properties") or {}
+    for k in CODE_PROPS:
+        if props.get(k) not in (None, ""):
+            return str(props[k]).split(".")[0]
+    return str(feat.get("id", "")).split(".")[0]
+
+def read_geojson(path: str) -> Dict[str, dict]:
+    """código IBGE -> geometria (só Polygon/MultiPolygon)."""
+    with open(path, "r", encoding="utf-8") as f:
+        gj = json.load(f)
+    out = {}
+    for feat in gj.get("features", []):
+        geom = feat.get("geometry")
+        code = _feature_code(feat)
+        if geom and code.isdigit() and geom.get("type") in ("Polygon", "MultiPolygon"):
+            out[code] = geom
+    return out
+
+def centroids_from_geometries(geoms: Dict[str, dict]) -> Dict[str, Tuple[float, float, float]]:
+    """código IBGE -> (área, lat, lon)."""
+    out = {}
+    for code, geom in geoms.items():
+        area, lon, lat = geometry_centroid(geom)
+        out[code] = (area, lat, lon)
+    return out
+
+def centroids_from_csv(path: str) -> Dict[str, Tuple[float, float, float]]:
+    """código IBGE -> (1, lat, lon), a partir de um CSV com código e lat/lon."""
+    src = pd.read_csv(path, dtype=str)
+    lat_c, lon_c = guess_latlon_cols(src)
+    code_c = next((c for c in src.columns if c in CODE_PROPS or c.lower() in ("codigo_ibge", "codigo")), None)
+    if not (lat_c and lon_c and code_c):
+        raise SystemExit(f"{path}: preciso de uma coluna de código IBGE e colunas lat/lon")
+    out = {}
+    for code, lat, lon in zip(src[code_c], src[lat_c], src[lon_c]):
+        try:
+            out[str(code).split(".")[0]] = (1.0, float(str(lat).replace(",", ".")), float(str(lon).replace(",", ".")))
+        except ValueError:
+            continue
+    return out
+
+def _write_csv(df: pd.DataFrame, path: str):
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=False, encoding="utf-8")
+    os.replace(tmp, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Acrescenta lat/lon (centroides) aos CSVs de UFs e municípios.")
+    src = parser.add_mutually_exclusive_group()
+    src.add_argument("--geojson", help="malha municipal GeoJSON (padrão: data/geo/municipios_simplificado.geojson)")
+    src.add_argument("--coords", help="CSV com código IBGE do município + lat/lon")
+    parser.add_argument("--geo-dir", default=GEO_DIR)
+    parser.add_argument("--no-store", action="store_true", help="não gravar a malha compacta (.mgeo)")
+    args = parser.parse_args()
+
+    mun_path = os.path.join(args.geo_dir, "municipios.csv")
+    ufs_path = os.path.join(args.geo_dir, "ufs.csv")
+    if args.coords:
+        cents = centroids_from_csv(args.coords)
+    else:
+        gj_path = args.geojson or os.path.join(args.geo_dir, "municipios_simplificado.geojson")
+        if not os.path.exists(gj_path):
+            raise SystemExit(f"Não encontrei {gj_path}; informe --geojson ou --coords.")
+        geoms = read_geojson(gj_path)
+        cents = centroids_from_geometries(geoms)
+        if not args.no_store:
+            store_path = os.path.join(args.geo_dir, "municipios.mgeo")
+            stats = write_store(geoms.items(), store_path)
+            levels = " / ".join(f"{v}" for k, v in stats.items() if k.startswith("pontos"))
+            print(f"✔ Malha compacta: {store_path} ({stats['bytes'] / 1e6:.1f} MB; pontos por nível: {levels})")
+
+    mun = pd.read_csv(mun_path, dtype={"ibge_mun": str})
+    ufs = pd.read_csv(ufs_path, dtype={"ibge_uf": str})
+    hit = mun["ibge_mun"].map(cents)
+    mun["lat"] = hit.map(lambda c: round(c[1], 5) if isinstance(c, tuple) else None)
+    mun["lon"] = hit.map(lambda c: round(c[2], 5) if isinstance(c, tuple) else None)
+    area = hit.map(lambda c: abs(c[0]) or 1.0 if isinstance(c, tuple) else 0.0)
+
+    w = mun.assign(_w=area, _wlat=mun["lat"] * area, _wlon=mun["lon"] * area).dropna(subset=["lat", "lon"])
+    agg = w.groupby("uf")[["_w", "_wlat", "_wlon"]].sum()
+    ufs["lat"] = ufs["uf"].map((agg["_wlat"] / agg["_w"]).round(5))
+    ufs["lon"] = ufs["uf"].map((agg["_wlon"] / agg["_w"]).round(5))
+
+    _write_csv(mun, mun_path)
+    _write_csv(ufs, ufs_path)
+    found = int(mun["lat"].notna().sum())
+    print(f"✔ Centroides em {found} de {len(mun)} municípios e {int(ufs['lat'].notna().sum())} UFs")
+    missing = mun.loc[mun["lat"].isna(), "nome_mun"].head(5).tolist()
+    if missing:
+        print(f"  sem coordenadas (ex.): {', '.join(missing)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# catalog.py
+# Leitura e limpeza da planilha de políticas públicas (sem dependência do Streamlit).
+
+import glob
+import hashlib
+import io
+import os
+import pickle
+
+import pandas as pd
+
+from textnorm import norm_series
+
+CATALOG_COLUMNS = [
+    "Número",
+    "Politicas publicas",
+    "nivel",
+    "Operacionalização/Aplicação",
+    "Descrição dos direitos",
+    "Acesso",
+    "Organização interna (Subprogramas e/ou Eixos)",
+    "Link",
+    "Observações",
+]
+
+def read_catalog(path) -> pd.DataFrame:
+    """`path`: caminho ou arquivo binário (BytesIO) da planilha."""
+    df = pd.read_excel(path, sheet_name=0)
+    df.columns = [c.strip() for c in df.columns]
+    keep = [c for c in CATALOG_COLUMNS if c in df.columns]
+    return df[keep].copy()
+
+# --- Snapshot compilado --------------------------------------------------
+# O openpyxl é a etapa mais lenta da inicialização. O DataFrame limpo e o
+# texto de "Acesso" já normalizado ficam num arquivo binário (pickle dos
+# blocos de colunas do pandas) identificado pelo hash do conteúdo da
+# planilha; enquanto a planilha não mudar, o snapshot é reaproveitado.
+SNAPSHOT_FORMAT = 1
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", ".cache")
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _compile(path):
+    df = read_catalog(path)
+    acesso = df["Acesso"] if "Acesso" in df.columns else pd.Series(dtype=object)
+    return df, norm_series(acesso.map(str) if len(acesso) else acesso)
+
+def load_catalog(path: str, cache_dir: str = CACHE_DIR):
+    """
+    (df, acesso_norm, sha256): catálogo limpo, coluna "Acesso" normalizada
+    (str(valor), como no casamento) e o hash dos bytes carregados. A planilha
+    é lida uma vez só: hash e DataFrame vêm do mesmo conteúdo, mesmo que o
+    arquivo seja regravado no meio. Usa o snapshot se existir para esse hash;
+    senão compila, grava o snapshot e remove os de versões anteriores.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    snap = os.path.join(cache_dir, f"catalog-{digest[:16]}.pkl")
+    try:
+        with open(snap, "rb") as f:
+            data = pickle.load(f)
+        if data.get("format") == SNAPSHOT_FORMAT and data.get("sha256") == digest:
+            return data["df"], data["acesso_norm"], digest
+    except FileNotFoundError:
+        pass
+    except Exception:
+        # snapshot corrompido ou de outra versão do pandas/numpy (ImportError,
+        # TypeError, ValueError...): é só cache, descarta e recompila
+        try:
+            os.remove(snap)
+        except OSError:
+            pass
+
+    df, acesso_norm = _compile(io.BytesIO(raw))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{snap}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"format": SNAPSHOT_FORMAT, "sha256": digest, "df": df, "acesso_norm": acesso_norm},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snap)  # troca atômica: leitores nunca veem arquivo pela metade
+        for old in glob.glob(os.path.join(cache_dir, "catalog-*.pkl")):
+            if old != snap:
+                os.remove(old)
+    except OSError:
+        pass  # sem permissão de escrita: segue sem snapshot
+    return df, acesso_norm, digest
@@ -1,8 +1,10 @@
 # db.py
 from typing import Optional, Dict, Any, List, Tuple
-import os, json, sqlite3
+import os, json, sqlite3, queue, time, atexit
+from contextlib import contextmanager
 from datetime import datetime
-from threading import Lock
+from threading import Lock, BoundedSemaphore, Event, Thread
+import logging
 
 # db.py (acrescente estes imports no topo)
 import os, hmac, binascii
@@ -34,15 +36,145 @@ def _verify_password(password: str, stored: str) -> bool:
     except Exception:
         return False
 
+log = logging.getLogger(__name__)
+
 DB_PATH = os.getenv("DB_PATH", "pp_platform.db")
 _DB_LOCK = Lock()
 
+# --- Pool de conexões ------------------------------------------------------
+# Cada DB_PATH tem um pool limitado de conexões já configuradas (PRAGMAs uma
+# vez só, cache de statements do sqlite3 aproveitado entre chamadas). Pool e
+# não conexão por thread: o Streamlit roda cada rerun numa thread nova, então
+# conexões por thread seriam abertas (e esquecidas) a cada clique.
+# `with _conn() as cn` empresta uma conexão, faz commit (ou rollback, se der
+# erro) e a devolve ao pool. As leituras do Observatório usam um pool à parte,
+# só de leitura (PRAGMA query_only), que não disputa com quem escreve.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+CACHED_STATEMENTS = 256
+
+class ConnectionPool:
+    """
+    Até `size` conexões para `path`. `stats` conta aberturas, empréstimos e
+    o tempo gasto abrindo conexões e esperando por uma livre.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE, readonly: bool = False):
+        self.path, self.size, self.readonly = path, max(1, size), readonly
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = BoundedSemaphore(self.size)
+        self._lock = Lock()
+        self._all: List[sqlite3.Connection] = []
+        self._closed = False
+        self.stats = {"opened": 0, "checkouts": 0, "open_s": 0.0, "wait_s": 0.0}
+
+    def _open(self) -> sqlite3.Connection:
+        t0 = time.perf_counter()
+        cn = sqlite3.connect(self.path, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000,
+                             cached_statements=CACHED_STATEMENTS)
+        cn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+        if self.readonly:
+            cn.execute("PRAGMA query_only=ON;")
+        else:
+            cn.execute("PRAGMA journal_mode=WAL;")
+            cn.execute("PRAGMA synchronous=NORMAL;")
+            cn.execute("PRAGMA foreign_keys=ON;")
+        with self._lock:
+            self._all.append(cn)
+            self.stats["opened"] += 1
+            self.stats["open_s"] += time.perf_counter() - t0
+        return cn
+
+    def _discard(self, cn: sqlite3.Connection):
+        with self._lock:
+            if cn in self._all:
+                self._all.remove(cn)
+        try:
+            cn.close()
+        except sqlite3.Error:
+            pass
+
+    def _release(self, cn: sqlite3.Connection):
+        if self._closed:
+            self._discard(cn)
+        else:
+            self._idle.put(cn)
+
+    @contextmanager
+    def connection(self):
+        t0 = time.perf_counter()
+        self._slots.acquire()
+        waited = time.perf_counter() - t0
+        try:
+            try:
+                cn = self._idle.get_nowait()
+            except queue.Empty:
+                cn = self._open()
+            with self._lock:
+                self.stats["checkouts"] += 1
+                self.stats["wait_s"] += waited
+            try:
+                with cn:  # commit no sucesso, rollback na exceção
+                    yield cn
+            except (sqlite3.ProgrammingError, sqlite3.InterfaceError):
+                self._discard(cn)  # conexão em estado inválido: não volta ao pool
+                raise
+            except BaseException:
+                if cn.in_transaction:
+                    cn.rollback()
+                self._release(cn)
+                raise
+            else:
+                self._release(cn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Fecha as conexões livres; as emprestadas são fechadas quando voltarem."""
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+_POOLS: Dict[Tuple[str, bool], ConnectionPool] = {}
+_POOLS_LOCK = Lock()
+
+def _pool(readonly: bool = False) -> ConnectionPool:
+    key = (DB_PATH, readonly)
+    pool = _POOLS.get(key)
+    if pool is None:
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None:
+                pool = _POOLS[key] = ConnectionPool(DB_PATH, readonly=readonly)
+    return pool
+
 def _conn():
-    cn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cn.execute("PRAGMA journal_mode=WAL;")
-    cn.execute("PRAGMA synchronous=NORMAL;")
-    cn.execute("PRAGMA foreign_keys=ON;")
-    return cn
+    """Conexão de leitura e escrita emprestada do pool de DB_PATH."""
+    return _pool().connection()
+
+def _read_conn():
+    """Conexão só de leitura (query_only), para as consultas do Observatório."""
+    return _pool(readonly=True).connection()
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Contadores dos pools abertos neste processo, por caminho do banco."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.items())
+    return {f"{path} ({'leitura' if ro else 'escrita'})": dict(p.stats, idle=p._idle.qsize())
+            for (path, ro), p in pools}
+
+def close_pools() -> None:
+    """Fecha as conexões de todos os pools (fim do processo, troca de DB_PATH em testes)."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for p in pools:
+        p.close()
+
+atexit.register(close_pools)
 
 def init_db():
     with _conn() as cn:
@@ -122,9 +254,217 @@ def migrate_analytics():
         try: cn.execute("ALTER TABLE analytics_events ADD COLUMN met_json TEXT")
         except Exception: pass
 
+# --- Localização canônica (códigos IBGE) ---------------------------
+# log_event grava ibge_uf/ibge_mun (inteiros) resolvidos na escrita; o
+# Observatório filtra e agrupa por eles. O índice nome -> código é o
+# geo.GeoIndex: o app compartilha o seu (set_geo_index); sem isso, é montado
+# a partir de data/geo na primeira necessidade.
+GEO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "geo")
+_GEO = None
+_GEO_LOCK = Lock()
+
+def set_geo_index(index) -> None:
+    global _GEO
+    _GEO = index
+
+def _geo():
+    global _GEO
+    if _GEO is None:
+        with _GEO_LOCK:
+            if _GEO is None:
+                import pandas as pd
+                from geo import GeoIndex
+                ufs_path = os.path.join(GEO_DIR, "ufs.csv")
+                mun_path = os.path.join(GEO_DIR, "municipios.csv")
+                ufs = pd.read_csv(ufs_path, dtype={"ibge_uf": str}) if os.path.exists(ufs_path) else pd.DataFrame()
+                mun = pd.read_csv(mun_path, dtype={"ibge_mun": str}) if os.path.exists(mun_path) else pd.DataFrame()
+                _GEO = GeoIndex(ufs, mun)
+    return _GEO
+
+def migrate_analytics_geo():
+    """analytics_events.ibge_uf / ibge_mun + preenchimento das linhas antigas."""
+    with _conn() as cn:
+        cols = [r[1] for r in cn.execute("PRAGMA table_info(analytics_events)").fetchall()]
+        if "ibge_uf" not in cols:
+            cn.execute("ALTER TABLE analytics_events ADD COLUMN ibge_uf INTEGER")
+        if "ibge_mun" not in cols:
+            cn.execute("ALTER TABLE analytics_events ADD COLUMN ibge_mun INTEGER")
+    backfill_analytics_geo()
+
+def backfill_analytics_geo(batch: int = 2000) -> int:
+    """
+    Resolve ibge_uf/ibge_mun das linhas que ainda não têm código, em lotes de
+    `batch` (uma transação por lote, percorrendo por id). Devolve quantas
+    linhas ganharam código.
+    """
+    geo = _geo()
+    memo: Dict[Tuple[Any, Any], Tuple[Optional[int], Optional[int]]] = {}
+    last_id, updated = 0, 0
+    while True:
+        # mesma ordem dos demais escritores: _DB_LOCK, depois a conexão do pool
+        with _DB_LOCK, _conn() as cn:
+            rows = cn.execute("""
+                SELECT id, uf, municipio FROM analytics_events
+                 WHERE id > ? AND ibge_uf IS NULL AND ibge_mun IS NULL
+                   AND (uf IS NOT NULL OR municipio IS NOT NULL)
+                 ORDER BY id LIMIT ?
+            """, (last_id, batch)).fetchall()
+            if not rows:
+                return updated
+            params = []
+            for rid, uf, mun in rows:
+                codes = memo.get((uf, mun))
+                if codes is None:
+                    codes = memo[(uf, mun)] = geo.locate(uf, mun)
+                if codes != (None, None):
+                    params.append((codes[0], codes[1], rid))
+            cn.executemany("UPDATE analytics_events SET ibge_uf = ?, ibge_mun = ? WHERE id = ?", params)
+            updated += len(params)
+            last_id = rows[-1][0]
+
 def _now_iso():
     return datetime.utcnow().isoformat()
 
+# --- Gravação de eventos em segundo plano ----------------------------------
+# log_event só monta a linha e a põe numa fila (não bloqueia o rerun); uma
+# thread grava as linhas com executemany, numa transação por lote, quando
+# juntar EVENT_BATCH linhas ou EVENT_FLUSH_S segundos depois da primeira
+# pendente. Fila cheia descarta o evento (contado em `dropped`). As pendentes
+# são gravadas no fim do processo e antes das leituras do Observatório.
+# DB_ASYNC_EVENTS=0 volta a gravar na hora (scripts, depuração).
+EVENT_BATCH = int(os.getenv("DB_EVENT_BATCH", "500"))
+EVENT_FLUSH_S = float(os.getenv("DB_EVENT_FLUSH_S", "1.0"))
+EVENT_QUEUE_MAX = int(os.getenv("DB_EVENT_QUEUE_MAX", "50000"))
+ASYNC_EVENTS = os.getenv("DB_ASYNC_EVENTS", "1") != "0"
+
+_EVENT_SQL = """
+INSERT INTO analytics_events (ts, kind, policy, uf, municipio, query, gender, met_json, missing_json, extras_json,
+                              ibge_uf, ibge_mun)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _write_events(rows: List[tuple]) -> None:
+    with _DB_LOCK:
+        with _conn() as cn:
+            cn.executemany(_EVENT_SQL, rows)
+
+class _Flush(Event):
+    """Marca na fila: o gravador grava o lote atual e avisa (e para, se `stop`)."""
+
+    def __init__(self, stop: bool = False):
+        super().__init__()
+        self.stop = stop
+
+class EventWriter:
+    """
+    Fila + thread gravadora. `stats`: enqueued, written, dropped, failed,
+    batches; `depth` é o tamanho atual da fila.
+    """
+
+    def __init__(self, batch: int = EVENT_BATCH, flush_s: float = EVENT_FLUSH_S, maxsize: int = EVENT_QUEUE_MAX):
+        self.batch, self.flush_s = max(1, batch), flush_s
+        self._q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._lock = Lock()
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+        self._thread = Thread(target=self._run, name="analytics-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        return self._q.qsize()
+
+    @property
+    def pending(self) -> int:
+        """Eventos aceitos e ainda não gravados (na fila ou no lote em andamento)."""
+        with self._lock:
+            return self.stats["enqueued"] - self.stats["written"] - self.stats["failed"]
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def submit(self, row: tuple) -> bool:
+        """Enfileira sem bloquear; False se a fila estiver cheia (evento descartado)."""
+        try:
+            self._q.put_nowait(row)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._q.get()
+            rows, waiters = [], []
+            deadline = time.monotonic() + self.flush_s
+            while True:
+                if isinstance(item, _Flush):  # flush()/close(): grava já o que houver
+                    waiters.append(item)
+                    stop = stop or item.stop
+                    break
+                rows.append(item)
+                if len(rows) >= self.batch:
+                    break
+                try:
+                    item = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if rows:
+                try:
+                    _write_events(rows)
+                    self._count("written", len(rows))
+                    self._count("batches")
+                except Exception as e:
+                    self._count("failed", len(rows))
+                    log.warning("Falha ao gravar %d eventos de analytics: %s", len(rows), e)
+            for w in waiters:
+                w.set()
+
+    def flush(self, timeout: Optional[float] = 10.0, _stop: bool = False) -> bool:
+        """Grava o que estiver na fila e espera terminar. False se estourar o tempo."""
+        if not self._thread.is_alive():
+            return True
+        marker = _Flush(stop=_stop)
+        try:
+            self._q.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> bool:
+        """Grava as pendentes e encerra a thread."""
+        ok = self.flush(timeout, _stop=True)
+        self._thread.join(timeout)
+        return ok
+
+_WRITER: Optional[EventWriter] = None
+_WRITER_LOCK = Lock()
+
+def event_writer() -> EventWriter:
+    global _WRITER
+    if _WRITER is None:
+        with _WRITER_LOCK:
+            if _WRITER is None:
+                _WRITER = EventWriter()
+                # registrado depois de close_pools: no atexit (ordem inversa) grava antes de fechar
+                atexit.register(_WRITER.close)
+    return _WRITER
+
+def flush_events(timeout: Optional[float] = 10.0) -> bool:
+    """Grava os eventos pendentes (se houver gravador em segundo plano)."""
+    w = _WRITER
+    return w.flush(timeout) if w is not None and w.pending else True
+
+def event_stats() -> Dict[str, int]:
+    """Contadores do gravador de eventos (zeros se ainda não foi usado)."""
+    w = _WRITER
+    if w is None:
+        return {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0, "depth": 0}
+    with w._lock:
+        return dict(w.stats, depth=w.depth)
+
 def log_event(kind: str,
               policy: str|None=None,
               uf: str|None=None,
@@ -133,40 +473,68 @@ def log_event(kind: str,
               gender: str|None=None,
               met: list|None=None,
               missing: list|None=None,
-              extras: dict|None=None):
+              extras: dict|None=None,
+              ibge_mun: int|str|None=None):
     mj  = _json.dumps(met, ensure_ascii=False)     if met     is not None else None
     msj = _json.dumps(missing, ensure_ascii=False) if missing is not None else None
     ej  = _json.dumps(extras, ensure_ascii=False)  if extras  is not None else None
-    with _DB_LOCK:
-        with _conn() as cn:
-            cn.execute("""
-            INSERT INTO analytics_events (ts, kind, policy, uf, municipio, query, gender, met_json, missing_json, extras_json)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (_now_iso(), kind, policy, uf, municipio, query, gender, mj, msj, ej))
+    uf_code, mun_code = _geo().locate(uf, municipio, ibge_mun) if (uf or municipio or ibge_mun) else (None, None)
+    row = (_now_iso(), kind, policy, uf, municipio, query, gender, mj, msj, ej, uf_code, mun_code)
+    if ASYNC_EVENTS:
+        event_writer().submit(row)
+    else:
+        _write_events([row])
 
-def get_analytics(start_iso: str|None=None, end_iso: str|None=None,
-                  uf: str|None=None, municipio: str|None=None, gender: str|None=None):
-    sql = """SELECT ts, kind, policy, uf, municipio, query, gender, met_json, missing_json, extras_json
+def _analytics_query(start_iso=None, end_iso=None, gender=None, ibge_uf=None, ibge_mun=None):
+    """(sql, args) de get_analytics; separado para check_query_plans ver a mesma consulta."""
+    sql = """SELECT ts, kind, policy, uf, municipio, query, gender, met_json, missing_json, extras_json,
+                    ibge_uf, ibge_mun
              FROM analytics_events WHERE 1=1"""
     args = []
     if start_iso: sql += " AND ts >= ?"; args.append(start_iso)
     if end_iso:   sql += " AND ts <= ?"; args.append(end_iso)
-    if uf:        sql += " AND uf = ?";  args.append(uf)
-    if municipio: sql += " AND municipio = ?"; args.append(municipio)
+    if ibge_uf is not None:  sql += " AND ibge_uf = ?";  args.append(int(ibge_uf))
+    if ibge_mun is not None: sql += " AND ibge_mun = ?"; args.append(int(ibge_mun))
     if gender:    sql += " AND gender = ?"; args.append(gender)
     sql += " ORDER BY ts DESC"
+    return sql, tuple(args)
+
+def get_analytics(start_iso: str|None=None, end_iso: str|None=None,
+                  uf: str|None=None, municipio: str|None=None, gender: str|None=None,
+                  ibge_uf: int|None=None, ibge_mun: int|None=None):
+    """Eventos do período; UF/município em texto são convertidos para código IBGE antes do filtro."""
+    if (uf or municipio) and ibge_uf is None and ibge_mun is None:
+        ibge_uf, ibge_mun = _geo().locate(uf, municipio)
+        if (uf and ibge_uf is None) or (municipio and ibge_mun is None):
+            return []  # local desconhecido: nenhum evento pode casar
+    sql, args = _analytics_query(start_iso, end_iso, gender, ibge_uf, ibge_mun)
+    flush_events()  # inclui os eventos ainda na fila do gravador
     rows = []
-    with _conn() as cn:
-        for r in cn.execute(sql, tuple(args)):
+    with _read_conn() as cn:
+        for r in cn.execute(sql, args):
             rows.append({
                 "ts": r[0], "kind": r[1], "policy": r[2], "uf": r[3], "municipio": r[4],
                 "query": r[5], "gender": r[6],
                 "met": _json.loads(r[7]) if r[7] else None,
                 "missing": _json.loads(r[8]) if r[8] else None,
                 "extras": _json.loads(r[9]) if r[9] else None,
+                "ibge_uf": r[10], "ibge_mun": r[11],
             })
     return rows
 
+_SQL_SEARCH_TERMS = """
+SELECT query, COUNT(*) FROM analytics_events
+ WHERE kind = 'search' AND query IS NOT NULL AND query <> ''
+ GROUP BY query ORDER BY COUNT(*) DESC LIMIT ?
+"""
+
+def search_term_counts(limit: int = 500) -> dict:
+    """Termos mais buscados (kind='search') -> nº de buscas, para ranquear sugestões."""
+    flush_events()
+    with _read_conn() as cn:
+        rows = cn.execute(_SQL_SEARCH_TERMS, (limit,)).fetchall()
+    return {q: n for q, n in rows}
+
 def migrate_db():
     """Garante que a tabela profiles tenha updated_at e popula valores faltantes."""
     with _conn() as cn:
@@ -198,6 +566,100 @@ def migrate_db():
                  WHERE updated_at IS NULL OR updated_at = '' OR created_at IS NULL OR created_at = '';
             """, (now, now))
 
+# --- Índices ---------------------------------------------------------------
+# Um índice por caminho de acesso real (ver check_query_plans):
+#   get_analytics: período (ts) e, com filtro de lugar, (código IBGE, ts) — a
+#     igualdade no prefixo + intervalo em ts já sai na ordem do ORDER BY ts DESC;
+#     gênero fica como filtro residual sobre o índice escolhido
+#   search_term_counts: (kind, query) cobre o GROUP BY sem tocar na tabela
+#   perfis por dono + MAX(version): (dono, version)
+INDEXES = {
+    "idx_analytics_ts":            "analytics_events(ts)",
+    "idx_analytics_uf_ts":         "analytics_events(ibge_uf, ts)",
+    "idx_analytics_mun_ts":        "analytics_events(ibge_mun, ts)",
+    "idx_analytics_kind_query":    "analytics_events(kind, query)",
+    "idx_profiles_owner_version":  "profiles(owner_account_id, version)",
+    "idx_profiles_user_version":   "profiles(user_id, version)",
+}
+
+def migrate_indexes():
+    with _conn() as cn:
+        for name, target in INDEXES.items():
+            cn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+def query_plan(sql: str, args=()) -> List[str]:
+    """Linhas de EXPLAIN QUERY PLAN (coluna detail) da consulta."""
+    with _read_conn() as cn:
+        return [r[-1] for r in cn.execute("EXPLAIN QUERY PLAN " + sql, tuple(args))]
+
+def check_query_plans() -> List[Dict[str, Any]]:
+    """
+    Roda EXPLAIN QUERY PLAN nas consultas que o módulo faz e confere o índice
+    esperado (e, onde há ORDER BY, que não sobra ordenação em B-tree temporária).
+    Uma entrada por consulta: name, index, plan, ok.
+    """
+    day, week = "2024-01-08T00:00:00", "2024-01-01T00:00:00"
+    cases = [
+        ("analytics: período", _analytics_query(week, day), "idx_analytics_ts", True),
+        ("analytics: tudo (ORDER BY ts)", _analytics_query(), "idx_analytics_ts", True),
+        ("analytics: UF + período", _analytics_query(week, day, ibge_uf=35), "idx_analytics_uf_ts", True),
+        ("analytics: município + período",
+         _analytics_query(week, day, ibge_uf=35, ibge_mun=3509502), "idx_analytics_mun_ts", True),
+        ("analytics: gênero + período", _analytics_query(week, day, gender="mulher"), "idx_analytics_ts", True),
+        ("termos buscados", (_SQL_SEARCH_TERMS, (500,)), "idx_analytics_kind_query", False),
+        ("perfis da conta", (_SQL_PROFILES_BY_ACCOUNT, (1,)), "idx_profiles_owner_version", True),
+        ("última versão da conta", (_SQL_LAST_VERSION_BY_ACCOUNT, (1,)), "idx_profiles_owner_version", False),
+        ("perfis do usuário", (_SQL_PROFILES_BY_USER, ("u",)), "idx_profiles_user_version", True),
+        ("última versão do usuário", (_SQL_LAST_VERSION_BY_USER, ("u",)), "idx_profiles_user_version", False),
+    ]
+    out = []
+    for name, (sql, args), index, ordered in cases:
+        plan = query_plan(sql, args)
+        ok = any(f"INDEX {index} " in d or d.endswith(f"INDEX {index}") for d in plan)
+        if ordered:
+            ok = ok and not any("TEMP B-TREE FOR ORDER BY" in d for d in plan)
+        out.append({"name": name, "index": index, "plan": plan, "ok": ok})
+    return out
+
+# --- Bootstrap com versionamento de schema -------------------------------
+# Cada migração é idempotente; a versão aplicada fica em PRAGMA user_version.
+# bootstrap_db() roda as pendentes uma única vez por processo: os reruns do
+# Streamlit (que reexecutam app.py a cada clique) não tocam mais no banco.
+MIGRATIONS = [
+    (1, init_db),            # users, profiles, eligibility_results
+    (2, migrate_db),         # profiles.created_at/updated_at + preenchimento
+    (3, migrate_accounts),   # accounts + profiles.owner_account_id
+    (4, migrate_analytics),  # analytics_events (+ gender, met_json)
+    (5, migrate_analytics_geo),  # analytics_events.ibge_uf/ibge_mun + preenchimento em lotes
+    (6, migrate_indexes),    # índices de analytics_events e profiles (INDEXES)
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_BOOT_LOCK = Lock()
+_BOOTED_PATH = None
+
+def schema_version() -> int:
+    with _conn() as cn:
+        return cn.execute("PRAGMA user_version").fetchone()[0]
+
+def bootstrap_db() -> int:
+    """Aplica as migrações pendentes (uma vez por processo e por DB_PATH). Devolve a versão do schema."""
+    global _BOOTED_PATH
+    if _BOOTED_PATH == DB_PATH:
+        return SCHEMA_VERSION
+    with _BOOT_LOCK:
+        if _BOOTED_PATH == DB_PATH:
+            return SCHEMA_VERSION
+        current = schema_version()
+        for version, migrate in MIGRATIONS:
+            if version > current:
+                migrate()
+                with _conn() as cn:
+                    cn.execute(f"PRAGMA user_version = {int(version)}")
+                current = version
+        _BOOTED_PATH = DB_PATH
+        return current
+
 from datetime import datetime
 
 def create_person_account(name: str, username: str, password: str) -> int:
@@ -256,13 +718,22 @@ def ensure_user(user_id: str, name: Optional[str] = None):
                     (user_id, name or "", datetime.utcnow().isoformat())
                 )
 
+# consultas de perfis por dono; servidas por idx_profiles_owner_version / idx_profiles_user_version
+_SQL_LAST_VERSION_BY_ACCOUNT = "SELECT COALESCE(MAX(version), 0) FROM profiles WHERE owner_account_id = ?"
+_SQL_PROFILES_BY_ACCOUNT = """
+SELECT id, version, created_at, updated_at
+  FROM profiles
+ WHERE owner_account_id=?
+ ORDER BY version DESC
+"""
+_SQL_LAST_VERSION_BY_USER = "SELECT COALESCE(MAX(version), 0) FROM profiles WHERE user_id = ?"
+_SQL_PROFILES_BY_USER = "SELECT id, version, created_at, updated_at FROM profiles WHERE user_id = ? ORDER BY version DESC"
+
 def save_profile_for_account(owner_account_id: int, profile: Dict[str, Any]) -> int:
     now = datetime.utcnow().isoformat()
     with _DB_LOCK:
         with _conn() as cn:
-            last_ver = cn.execute("""
-                SELECT COALESCE(MAX(version), 0) FROM profiles WHERE owner_account_id = ?
-            """, (owner_account_id,)).fetchone()[0]
+            last_ver = cn.execute(_SQL_LAST_VERSION_BY_ACCOUNT, (owner_account_id,)).fetchone()[0]
             version = (last_ver or 0) + 1
             cur = cn.execute("""
                 INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at, owner_account_id)
@@ -284,22 +755,14 @@ def update_profile_for_account(profile_id: int, owner_account_id: int, profile:
 
 def get_profiles_by_account(owner_account_id: int) -> List[Tuple[int,int,str,str]]:
     with _conn() as cn:
-        cur = cn.execute("""
-            SELECT id, version, created_at, updated_at
-              FROM profiles
-             WHERE owner_account_id=?
-             ORDER BY version DESC
-        """, (owner_account_id,))
+        cur = cn.execute(_SQL_PROFILES_BY_ACCOUNT, (owner_account_id,))
         return cur.fetchall()
 
 def save_profile(user_id: str, profile: Dict[str, Any]) -> int:
     now = datetime.utcnow().isoformat()
     with _DB_LOCK:
         with _conn() as cn:
-            last_ver = cn.execute(
-                "SELECT COALESCE(MAX(version), 0) FROM profiles WHERE user_id = ?",
-                (user_id,)
-            ).fetchone()[0]
+            last_ver = cn.execute(_SQL_LAST_VERSION_BY_USER, (user_id,)).fetchone()[0]
             version = (last_ver or 0) + 1
             cur = cn.execute(
                 "INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
@@ -319,10 +782,7 @@ def update_profile(profile_id: int, profile: Dict[str, Any]):
 
 def get_profiles(user_id: str) -> List[Tuple[int, int, str, str]]:
     with _conn() as cn:
-        cur = cn.execute(
-            "SELECT id, version, created_at, updated_at FROM profiles WHERE user_id = ? ORDER BY version DESC",
-            (user_id,)
-        )
+        cur = cn.execute(_SQL_PROFILES_BY_USER, (user_id,))
         return cur.fetchall()
 
 def load_profile(profile_id: int) -> Dict[str, Any]:
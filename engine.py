@@ -0,0 +1,142 @@
+# engine.py
+# Snapshot imutável de tudo que o casamento precisa (catálogo, regras, índices)
+# e um observador que reconstrói o snapshot em segundo plano quando a planilha
+# ou os JSONs de configuração mudam, trocando a referência de forma atômica.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from catalog import load_catalog, file_sha256
+from fuzzy import build_fuzzy_requirement_index
+from search import SearchIndex
+from utils import get_matcher, build_requirement_index, norm_series
+
+log = logging.getLogger(__name__)
+
+SEARCH_COLS = ["Politicas publicas", "Descrição dos direitos", "Acesso", "Organização interna (Subprogramas e/ou Eixos)"]
+
+class Engine:
+    """Versão consistente do catálogo + regras. Nunca é alterada depois de criada."""
+
+    def __init__(self, version: str, df: pd.DataFrame, acesso_norm: pd.Series, schema: Dict[str, Any],
+                 kw_map: Dict[str, Dict[str, Any]], mode: str):
+        self.version = version
+        self.df = df
+        self.acesso_norm = acesso_norm
+        self.schema = schema
+        self.kw_map = kw_map
+        self.mode = mode
+        self.matcher = get_matcher(kw_map)
+        if "Acesso" not in df.columns:
+            self.index = build_requirement_index([], kw_map, self.matcher)
+        elif mode == "fuzzy":
+            self.index = build_fuzzy_requirement_index(df["Acesso"], kw_map, normed=acesso_norm)
+        else:
+            self.index = build_requirement_index(df["Acesso"], kw_map, self.matcher, normed=acesso_norm)
+        # colunas de busca já normalizadas (minúsculas, sem acento), alinhadas ao df
+        self.search_text = pd.DataFrame({c: norm_series(df[c]) for c in SEARCH_COLS if c in df.columns},
+                                        index=df.index)
+        self.search = SearchIndex(self.search_text, df["nivel"] if "nivel" in df.columns else None)
+        self.built_at = time.time()
+
+def _version(mode: str, digests) -> str:
+    h = hashlib.sha256(mode.encode())
+    for digest in digests:
+        h.update(digest.encode())
+    return h.hexdigest()[:16]
+
+def sources_version(data_path: str, kw_path: str, schema_path: str, mode: str) -> str:
+    """Hash do conteúdo das três fontes + modo de detecção."""
+    return _version(mode, (file_sha256(p) for p in (data_path, kw_path, schema_path)))
+
+def build_engine(data_path: str, kw_path: str, schema_path: str, mode: str = "exact") -> Engine:
+    # a versão sai dos mesmos bytes que foram carregados (cada fonte é lida uma
+    # vez): se um arquivo for regravado durante a montagem, a versão não aponta
+    # para um conteúdo que este Engine não tem e o observador recarrega de novo
+    df, acesso_norm, data_digest = load_catalog(data_path)
+    with open(kw_path, "rb") as f:
+        kw_raw = f.read()
+    with open(schema_path, "rb") as f:
+        schema_raw = f.read()
+    kw_map = json.loads(kw_raw.decode("utf-8"))
+    schema = json.loads(schema_raw.decode("utf-8"))
+    digests = (data_digest, hashlib.sha256(kw_raw).hexdigest(), hashlib.sha256(schema_raw).hexdigest())
+    return Engine(_version(mode, digests), df, acesso_norm, schema, kw_map, mode)
+
+class EngineHolder:
+    """
+    Guarda o Engine atual. current() só lê uma referência (sem lock, nunca
+    espera reconstrução). Uma thread verifica mtime/tamanho das fontes a cada
+    `interval` segundos; se mudaram, monta o novo Engine fora do caminho das
+    requisições e só então troca a referência. Se a montagem falhar (ex.: JSON
+    salvo pela metade), o Engine anterior continua valendo.
+    """
+
+    def __init__(self, data_path: str, kw_path: str, schema_path: str, mode: str = "exact",
+                 interval: float = 2.0):
+        self.paths = (data_path, kw_path, schema_path)
+        self.mode = mode
+        self.interval = interval
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._stamp = self._stat()
+        self._engine = build_engine(*self.paths, mode)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def current(self) -> Engine:
+        return self._engine
+
+    def _stat(self):
+        out = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                out.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                out.append(None)
+        return tuple(out)
+
+    def check_now(self) -> bool:
+        """Verifica as fontes e recarrega se preciso. Devolve True se houve troca."""
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return False
+        try:
+            if sources_version(*self.paths, self.mode) == self._engine.version:
+                self._stamp = stamp  # só o mtime mudou (ex.: arquivo salvo sem alterações)
+                return False
+            new = build_engine(*self.paths, self.mode)
+        except Exception as e:  # mantém o Engine atual e tenta de novo na próxima mudança
+            self.last_error = f"{type(e).__name__}: {e}"
+            log.warning("Falha ao recarregar o catálogo/regras: %s", self.last_error)
+            self._stamp = stamp
+            return False
+        self._engine = new  # troca atômica da referência
+        self._stamp = stamp
+        self.reloads += 1
+        self.last_error = None
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check_now()
+
+    def start(self) -> "EngineHolder":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="engine-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -1,70 +1,225 @@
 # fetch_ibge_geo.py
 # Gera data/geo/ufs.csv e data/geo/municipios.csv usando a API do IBGE
+#
+# Os municípios são pedidos por UF, em paralelo (--workers). As respostas
+# ficam em cache no disco (data/geo/.http_cache) e são revalidadas com
+# ETag / If-Modified-Since; um 304 reaproveita o corpo salvo. Os CSVs são
+# escritos linha a linha num arquivo temporário e só substituem os atuais se
+# o conteúdo mudou. Colunas extras dos CSVs atuais (ex.: lat/lon de
+# build_geo.py) são preservadas.
+#
+# Teste sem internet, com o servidor local de ibge_stub.py:
+#   python ibge_stub.py --port 8765 &
+#   python fetch_ibge_geo.py --base-url http://127.0.0.1:8765/api/v1/localidades
 
+import argparse
+import csv
+import hashlib
+import json
 import os
+import random
+import threading
 import time
-import csv
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 GEO_DIR = os.path.join(BASE_DIR, "data", "geo")
-os.makedirs(GEO_DIR, exist_ok=True)
-
-UF_URL = "https://servicodados.ibge.gov.br/api/v1/localidades/estados?orderBy=nome"
-MUN_URL = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios?orderBy=nome"
-
-def fetch_json(url, retries=5, timeout=30):
-    last_err = None
-    for i in range(retries):
-        try:
-            r = requests.get(url, timeout=timeout)
-            r.raise_for_status()
-            return r.json()
-        except Exception as e:
-            last_err = e
-            time.sleep(1 + i)  # backoff simples
-    raise RuntimeError(f"Falha ao buscar {url}: {last_err}")
-
-def save_ufs(ufs, path):
+
+BASE_URL = "https://servicodados.ibge.gov.br/api/v1/localidades"
+UF_PATH = "/estados?orderBy=nome"
+MUN_PATH = "/estados/{uf_id}/municipios?orderBy=nome"
+
+UF_COLS = ["uf", "uf_nome", "ibge_uf"]
+MUN_COLS = ["ibge_mun", "nome_mun", "uf"]
+
+class HttpCache:
+    """
+    GET com cache em disco: corpo + validadores (ETag, Last-Modified) por URL.
+    Uma sessão HTTP por thread; contadores de rede/304 para o resumo.
+    """
+
+    def __init__(self, cache_dir, retries=5, timeout=30):
+        self.cache_dir = cache_dir
+        self.retries = retries
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {"200": 0, "304": 0, "retries": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _session(self):
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = requests.Session()
+        return s
+
+    def _paths(self, url):
+        h = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, h + ".json"), os.path.join(self.cache_dir, h + ".meta.json")
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def get_json(self, url):
+        body_path, meta_path = self._paths(url)
+        meta = {}
+        if os.path.exists(body_path) and os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        last_err = None
+        for i in range(self.retries):
+            try:
+                r = self._session().get(url, headers=headers, timeout=self.timeout)
+                if r.status_code == 304:
+                    self._count("304")
+                    with open(body_path, "rb") as f:
+                        return json.loads(f.read())
+                r.raise_for_status()
+                self._count("200")
+                self._save(body_path, r.content)
+                self._save(meta_path, json.dumps({
+                    "url": url, "etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+                }).encode())
+                return r.json()
+            except requests.RequestException as e:
+                last_err = e
+                status = getattr(e.response, "status_code", None)
+                if status is not None and 400 <= status < 500 and status != 429:
+                    break  # erro do cliente: repetir não adianta
+                self._count("retries")
+                time.sleep(min(30, 0.5 * 2 ** i) * random.uniform(0.5, 1.0))  # backoff exponencial com jitter
+        raise RuntimeError(f"Falha ao buscar {url}: {last_err}")
+
+    @staticmethod
+    def _save(path, data: bytes):
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+class CsvUpdate:
+    """
+    Escreve um CSV linha a linha num temporário e, ao fechar, só troca o
+    arquivo final se o conteúdo for diferente. Colunas extras do arquivo atual
+    são copiadas para as linhas novas pela coluna-chave.
+    """
+
+    def __init__(self, path, cols, key):
+        self.path, self.key = path, key
+        self.extra_cols, self._extras = [], {}
+        if os.path.exists(path):
+            with open(path, "r", newline="", encoding="utf-8") as f:
+                reader = csv.DictReader(f)
+                self.extra_cols = [c for c in (reader.fieldnames or []) if c not in cols]
+                if self.extra_cols:
+                    self._extras = {row[key]: [row.get(c, "") for c in self.extra_cols] for row in reader}
+        self.cols = list(cols)
+        self.tmp = path + ".tmp"
+        self._fh = open(self.tmp, "w", newline="", encoding="utf-8")
+        self._w = csv.writer(self._fh)
+        self._w.writerow(self.cols + self.extra_cols)
+        self.rows = 0
+
+    def write(self, row):
+        extra = self._extras.get(str(row[self.cols.index(self.key)]), [""] * len(self.extra_cols)) \
+            if self.extra_cols else []
+        self._w.writerow(list(row) + extra)
+        self.rows += 1
+
+    def abort(self):
+        self._fh.close()
+        os.remove(self.tmp)
+
+    def close(self) -> bool:
+        """Fecha e devolve True se o arquivo final foi (re)escrito."""
+        self._fh.close()
+        if os.path.exists(self.path) and _same_file(self.tmp, self.path):
+            os.remove(self.tmp)
+            return False
+        os.replace(self.tmp, self.path)
+        return True
+
+def _same_file(a, b, block=1 << 16):
+    if os.path.getsize(a) != os.path.getsize(b):
+        return False
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        while True:
+            x, y = fa.read(block), fb.read(block)
+            if x != y:
+                return False
+            if not x:
+                return True
+
+def uf_row(uf):
     # Campos: uf (sigla), uf_nome (nome por extenso), ibge_uf (código numérico)
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["uf", "uf_nome", "ibge_uf"])
-        for uf in sorted(ufs, key=lambda x: x.get("sigla", "")):
-            w.writerow([uf.get("sigla",""), uf.get("nome",""), str(uf.get("id",""))])
+    return [uf.get("sigla", ""), uf.get("nome", ""), str(uf.get("id", ""))]
 
-def save_municipios(muns, path):
+def mun_row(m, uf_sigla=""):
     # Campos: ibge_mun (id), nome_mun (nome), uf (sigla)
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["ibge_mun", "nome_mun", "uf"])
-        for m in muns:
-            ibge = str(m.get("id",""))
-            nome = m.get("nome","")
-            # A sigla da UF vem aninhada em microrregiao -> mesorregiao -> UF -> sigla
-            try:
-                uf_sigla = m["microrregiao"]["mesorregiao"]["UF"]["sigla"]
-            except Exception:
-                uf_sigla = ""
-            w.writerow([ibge, nome, uf_sigla])
+    # A sigla da UF vem aninhada em microrregiao -> mesorregiao -> UF -> sigla;
+    # municípios recém-criados podem vir sem microrregião: fica a UF consultada
+    try:
+        uf_sigla = m["microrregiao"]["mesorregiao"]["UF"]["sigla"]
+    except Exception:
+        pass
+    return [str(m.get("id", "")), m.get("nome", ""), uf_sigla]
+
+def run(base_url=BASE_URL, geo_dir=GEO_DIR, workers=8, cache_dir=None):
+    """Baixa UFs e municípios e atualiza os CSVs. Devolve um resumo (dict)."""
+    os.makedirs(geo_dir, exist_ok=True)
+    http = HttpCache(cache_dir or os.path.join(geo_dir, ".http_cache"))
+    t0 = time.perf_counter()
+
+    ufs = sorted(http.get_json(base_url + UF_PATH), key=lambda x: x.get("sigla", ""))
+    ufs_out = CsvUpdate(os.path.join(geo_dir, "ufs.csv"), UF_COLS, "uf")
+    for uf in ufs:
+        ufs_out.write(uf_row(uf))
+    ufs_changed = ufs_out.close()
+
+    # pool.map devolve na ordem das UFs: cada UF é gravada assim que chega a
+    # sua vez, sem esperar as demais nem juntar tudo em memória
+    mun_out = CsvUpdate(os.path.join(geo_dir, "municipios.csv"), MUN_COLS, "ibge_mun")
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            urls = [base_url + MUN_PATH.format(uf_id=uf["id"]) for uf in ufs]
+            for uf, muns in zip(ufs, pool.map(http.get_json, urls)):
+                for m in muns:
+                    mun_out.write(mun_row(m, uf.get("sigla", "")))
+    except BaseException:
+        mun_out.abort()
+        raise
+    mun_changed = mun_out.close()
+
+    return {
+        "ufs": len(ufs), "municipios": mun_out.rows,
+        "ufs_changed": ufs_changed, "municipios_changed": mun_changed,
+        "http_200": http.stats["200"], "http_304": http.stats["304"], "retries": http.stats["retries"],
+        "seconds": time.perf_counter() - t0,
+    }
 
 def main():
-    print("Baixando UFs do IBGE…")
-    ufs = fetch_json(UF_URL)
-    ufs_csv = os.path.join(GEO_DIR, "ufs.csv")
-    save_ufs(ufs, ufs_csv)
-    print(f"✔ UFs salvas em: {ufs_csv}")
-
-    print("Baixando municípios do IBGE… (pode levar alguns segundos)")
-    muns = fetch_json(MUN_URL)
-    muns_csv = os.path.join(GEO_DIR, "municipios.csv")
-    save_municipios(muns, muns_csv)
-    print(f"✔ Municípios salvos em: {muns_csv}")
-
-    # Resumo
-    uf_count = len(ufs)
-    mun_count = len(muns)
-    print(f"\nResumo: {uf_count} UFs e {mun_count} municípios gerados.")
+    parser = argparse.ArgumentParser(description="Atualiza data/geo/ufs.csv e municipios.csv a partir da API do IBGE.")
+    parser.add_argument("--base-url", default=BASE_URL, help="raiz da API de localidades (ou do ibge_stub.py)")
+    parser.add_argument("--geo-dir", default=GEO_DIR)
+    parser.add_argument("--workers", type=int, default=8, help="requisições simultâneas")
+    parser.add_argument("--cache-dir", help="cache HTTP (padrão: <geo-dir>/.http_cache)")
+    args = parser.parse_args()
+
+    print("Baixando UFs e municípios do IBGE…")
+    s = run(args.base_url.rstrip("/"), args.geo_dir, args.workers, args.cache_dir)
+    for name, changed in (("ufs.csv", s["ufs_changed"]), ("municipios.csv", s["municipios_changed"])):
+        print(f"{'✔ atualizado' if changed else '= sem mudanças'}: {os.path.join(args.geo_dir, name)}")
+    print(f"\nResumo: {s['ufs']} UFs e {s['municipios']} municípios em {s['seconds']:.1f}s "
+          f"({s['http_200']} downloads, {s['http_304']} não modificados, {s['retries']} novas tentativas).")
 
 if __name__ == "__main__":
     main()
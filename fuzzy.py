@@ -0,0 +1,175 @@
+# fuzzy.py
+# Detecção de requisitos tolerante a variações (plural, gênero, erros de
+# digitação) com índice de trigramas de caracteres sobre os textos de "Acesso".
+#
+# Relatório de diferenças em relação ao casamento exato:
+#   python fuzzy.py --threshold 0.52
+#
+# Cada regra do keyword_map pode ter "min_similarity" próprio e "aliases"
+# (outras formas de escrever o requisito, ex.: "cadastro unico" para cadunico).
+
+import argparse
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+from textnorm import norm, norm_many, tokens
+from utils import KeywordMatcher, RequirementIndex, build_requirement_index, load_keyword_map
+
+DEFAULT_THRESHOLD = 0.52  # acima de "pesca" x "pescador" (0.50), abaixo de "associacoes" x "associacao" (0.53)
+
+def trigrams(term: str) -> frozenset:
+    """Trigramas com borda ("  ab", " abc", ..., "yz "), como no pg_trgm."""
+    padded = f"  {term} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+class TrigramIndex:
+    """
+    Vocabulário de termos (janelas de 1..n palavras) dos textos normalizados,
+    com listas invertidas trigrama -> termos e termo -> documentos.
+    """
+
+    def __init__(self, docs: Dict[Any, str], sizes=(1,)):
+        self.terms: List[str] = []
+        self.term_grams: List[frozenset] = []
+        self.term_docs: List[set] = []
+        self.term_size: List[int] = []  # nº de palavras de cada termo
+        self.postings: Dict[str, List[int]] = {}
+        term_id: Dict[str, int] = {}
+        for doc, text in docs.items():
+            ws = tokens(text)
+            for n in sizes:
+                for i in range(len(ws) - n + 1):
+                    term = " ".join(ws[i:i + n])
+                    tid = term_id.get(term)
+                    if tid is None:
+                        tid = term_id[term] = len(self.terms)
+                        grams = trigrams(term)
+                        self.terms.append(term)
+                        self.term_grams.append(grams)
+                        self.term_docs.append(set())
+                        self.term_size.append(n)
+                        for g in grams:
+                            self.postings.setdefault(g, []).append(tid)
+                    self.term_docs[tid].add(doc)
+
+    def _matches(self, term: str, threshold: float) -> List[Tuple[int, float]]:
+        # só janelas com o mesmo nº de palavras ("cadastro unico" não casa com "cadastro")
+        words = len(term.split())
+        grams = trigrams(term)
+        overlap = Counter()
+        for g in grams:
+            overlap.update(self.postings.get(g, ()))
+        na = len(grams)
+        out = []
+        for tid, common in overlap.items():
+            if self.term_size[tid] != words:
+                continue
+            sim = common / (na + len(self.term_grams[tid]) - common)
+            if sim >= threshold:
+                out.append((tid, sim))
+        return out
+
+    def similar(self, term: str, threshold: float) -> List[Tuple[str, float]]:
+        """Termos com similaridade de Jaccard (sobre trigramas) >= threshold."""
+        return [(self.terms[tid], sim) for tid, sim in self._matches(term, threshold)]
+
+    def docs_for(self, term: str, threshold: float) -> set:
+        """Documentos que contêm algum termo similar a `term`."""
+        docs = set()
+        for tid, _sim in self._matches(term, threshold):
+            docs |= self.term_docs[tid]
+        return docs
+
+def rule_terms(key: str, cond: Dict[str, Any]) -> List[str]:
+    """Chave + "aliases" da regra, normalizados ("Cadastro Único" -> "cadastro unico")."""
+    out = (" ".join(tokens(norm(t))) for t in [key, *cond.get("aliases", ())])
+    return [t for t in dict.fromkeys(out) if t]
+
+def build_fuzzy_requirement_index(texts, kw_map: Dict[str, Dict[str, Any]],
+                                  threshold: float = DEFAULT_THRESHOLD, normed=None) -> RequirementIndex:
+    """
+    Como utils.build_requirement_index, mas cada chave do keyword_map (e cada
+    um dos seus "aliases") casa com termos do texto (mesmo nº de palavras) por
+    similaridade de trigramas, ou aparece inteira entre limites de palavra.
+    Nunca dentro de outra palavra ("rgp" não casa com "sorgpx"). Tudo é
+    resolvido uma vez aqui; depois as consultas por política são só leituras
+    de dicionário.
+    """
+    pairs = list(texts.items() if isinstance(texts, pd.Series) else texts)
+    normed = list(normed) if normed is not None else norm_many([str(acesso) for _, acesso in pairs])
+    docs = {idx: req for (idx, acesso), req in zip(pairs, normed) if acesso}
+    key_terms = {key: rule_terms(key, cond) for key, cond in kw_map.items()}
+    sizes = sorted({len(t.split()) for terms in key_terms.values() for t in terms})
+    tindex = TrigramIndex(docs, sizes or (1,))
+
+    hits: Dict[Any, set] = {}
+    for key, terms in key_terms.items():
+        min_sim = float(kw_map[key].get("min_similarity", threshold))
+        for nk in terms:
+            for doc in tindex.docs_for(nk, min_sim):
+                hits.setdefault(doc, set()).add(key)
+
+    # ocorrências inteiras (limite de palavra nos dois lados), qualquer que seja
+    # o limiar: o texto vira " p1 p2 ... " e cada termo é procurado como " termo "
+    term_key = {f" {t} ": key for key, terms in key_terms.items() for t in terms}
+    matcher = KeywordMatcher(term_key)
+    for doc, text in docs.items():
+        for t in matcher.find(f" {' '.join(tokens(text))} "):
+            hits.setdefault(doc, set()).add(term_key[t])
+
+    policy_keys = {}
+    for idx in docs:
+        found = hits.get(idx)
+        if found:
+            policy_keys[idx] = tuple(k for k in kw_map if k in found)
+    return RequirementIndex(policy_keys, kw_map)
+
+def compare_detection(exact: RequirementIndex, fuzzy: RequirementIndex):
+    """Políticas cujo conjunto de requisitos mudou: (idx, ganhos, perdidos)."""
+    out = []
+    for idx in dict.fromkeys(list(exact.policy_keys) + list(fuzzy.policy_keys)):
+        a = set(exact.policy_keys.get(idx, ()))
+        b = set(fuzzy.policy_keys.get(idx, ()))
+        if a != b:
+            out.append((idx, sorted(b - a), sorted(a - b)))
+    return out
+
+def main():
+    base = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Compara a detecção aproximada (trigramas) com a exata.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="similaridade mínima (0-1)")
+    parser.add_argument("--data", default=os.path.join(base, "data", "politicas_publicas.xlsx"))
+    parser.add_argument("--keywords", default=os.path.join(base, "keyword_map.json"))
+    args = parser.parse_args()
+
+    from catalog import read_catalog
+    df = read_catalog(args.data)
+    kw_map = load_keyword_map(args.keywords)
+    exact = build_requirement_index(df["Acesso"], kw_map)
+    t0 = time.perf_counter()
+    fuzzy = build_fuzzy_requirement_index(df["Acesso"], kw_map, args.threshold)
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for idx in df.index:
+        fuzzy.policy_keys.get(idx, ())
+    t_lookup = (time.perf_counter() - t0) / max(len(df), 1)
+
+    diff = compare_detection(exact, fuzzy)
+    print(f"Exato: {len(exact)} políticas com requisitos • Aproximado (≥{args.threshold}): {len(fuzzy)}")
+    print(f"Índice de trigramas: {t_build * 1000:.1f} ms para montar • {t_lookup * 1e6:.2f} µs por política consultada")
+    for idx, gained, lost in diff:
+        name = df.loc[idx].get("Politicas publicas", idx)
+        print(f"- [{idx}] {name}")
+        if gained:
+            print(f"    + {', '.join(gained)}")
+        if lost:
+            print(f"    - {', '.join(lost)}")
+    if not diff:
+        print("Nenhuma diferença.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# geo.py
+# Índices de consulta sobre ufs.csv / municipios.csv, montados uma vez quando
+# os arquivos são carregados. O formulário de perfil só faz leituras de
+# dicionário (nada de filtrar DataFrame a cada rerun) e o mapa do Observatório
+# liga contagens a coordenadas pelo código IBGE (busca binária em vetor).
+# lat/lon vêm de build_geo.py.
+
+from types import MappingProxyType
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from textnorm import norm
+
+def guess_latlon_cols(df):
+    """Retorna (lat_col, lon_col) se existirem no DF, senão (None, None)."""
+    if df is None or df.empty:
+        return None, None
+    candidates = [("lat", "lon"), ("latitude", "longitude"), ("lat", "long"), ("y", "x")]
+    cols = {c.lower(): c for c in df.columns}
+    for la, lo in candidates:
+        if la in cols and lo in cols:
+            return cols[la], cols[lo]
+    return None, None
+
+def _coord_arrays(codes, df: pd.DataFrame):
+    """(códigos int64 ordenados, lat, lon) só das linhas com coordenadas."""
+    lat_c, lon_c = guess_latlon_cols(df)
+    if not lat_c:
+        return np.empty(0, np.int64), np.empty(0), np.empty(0)
+    code = pd.to_numeric(pd.Series(codes, index=df.index), errors="coerce")
+    lat = pd.to_numeric(df[lat_c], errors="coerce")
+    lon = pd.to_numeric(df[lon_c], errors="coerce")
+    ok = code.notna() & lat.notna() & lon.notna()
+    code, lat, lon = code[ok].to_numpy(np.int64), lat[ok].to_numpy(float), lon[ok].to_numpy(float)
+    order = np.argsort(code, kind="stable")
+    return code[order], lat[order], lon[order]
+
+class GeoIndex:
+    """
+    Estruturas imutáveis:
+      uf_options   tupla de siglas, na ordem do ufs.csv
+      uf_labels    sigla -> nome da UF
+      mun_names    sigla -> tupla de municípios em ordem alfabética (sem acento/caixa);
+                   a chave "" tem todos os municípios
+      mun_pos      sigla -> {nome: posição em mun_names[sigla]}
+      mun_code     (sigla, nome) -> código IBGE do município; ("", nome) = primeiro com esse nome
+      mun_by_code  código IBGE -> (nome, sigla)
+      mun_xy / uf_xy   (códigos int64 ordenados, lat, lon) para coords_mun / coords_uf
+      uf_code      sigla -> código IBGE da UF
+    """
+
+    def __init__(self, ufs: pd.DataFrame, mun: pd.DataFrame):
+        if not ufs.empty:
+            self.uf_options = tuple(ufs["uf"].astype(str).tolist())
+            self.uf_labels = MappingProxyType(dict(zip(ufs["uf"].astype(str), ufs["uf_nome"].astype(str))))
+        else:
+            self.uf_options, self.uf_labels = (), MappingProxyType({})
+
+        names, code, by_code, loose = {}, {}, {}, {}
+        if not mun.empty:
+            for ibge, nome, uf in zip(mun["ibge_mun"].astype(str), mun["nome_mun"].astype(str),
+                                      mun["uf"].fillna("").astype(str)):
+                names.setdefault(uf, []).append(nome)
+                names.setdefault("", []).append(nome)
+                code.setdefault((uf, nome), ibge)
+                code.setdefault(("", nome), ibge)
+                loose.setdefault((uf.upper(), norm(nome)), ibge)
+                loose.setdefault(("", norm(nome)), ibge)
+                by_code[ibge] = (nome, uf)
+        sort_key = lambda n: (norm(n), n)
+        self.mun_names = MappingProxyType({uf: tuple(sorted(dict.fromkeys(ns), key=sort_key))
+                                           for uf, ns in names.items()})
+        self.mun_pos = MappingProxyType({uf: MappingProxyType({n: i for i, n in enumerate(ns)})
+                                         for uf, ns in self.mun_names.items()})
+        self.mun_code = MappingProxyType(code)
+        self.mun_by_code = MappingProxyType(by_code)
+        self._loose_code = MappingProxyType(loose)
+
+        self.mun_xy = _coord_arrays(mun["ibge_mun"], mun) if not mun.empty else _coord_arrays([], mun)
+        self.uf_code = MappingProxyType({})
+        if not ufs.empty and "ibge_uf" in ufs.columns:
+            self.uf_code = MappingProxyType({uf: int(c) for uf, c in zip(ufs["uf"].astype(str), ufs["ibge_uf"])
+                                             if str(c).isdigit()})
+            self.uf_xy = _coord_arrays(ufs["ibge_uf"], ufs)
+        else:
+            self.uf_xy = _coord_arrays([], ufs)
+        for arr in (*self.mun_xy, *self.uf_xy):
+            arr.setflags(write=False)
+
+    @property
+    def has_mun_coords(self) -> bool:
+        return len(self.mun_xy[0]) > 0
+
+    @property
+    def has_uf_coords(self) -> bool:
+        return len(self.uf_xy[0]) > 0
+
+    def municipios(self, uf: Optional[str]) -> Tuple[str, ...]:
+        """Municípios da UF (ou todos, se `uf` vazia)."""
+        return self.mun_names.get(uf or "", ())
+
+    def position(self, uf: Optional[str], nome: Optional[str]) -> Optional[int]:
+        """Posição de `nome` em municipios(uf), ou None."""
+        return self.mun_pos.get(uf or "", {}).get(nome)
+
+    def code_for(self, uf: Optional[str], nome: Optional[str]) -> Optional[str]:
+        return self.mun_code.get((uf or "", nome))
+
+    def resolve(self, uf: Optional[str], nome: Optional[str]) -> Optional[str]:
+        """Como code_for, mas tolera texto livre (caixa, acentos, espaços)."""
+        if not nome:
+            return None
+        uf = (uf or "").strip()
+        return self.mun_code.get((uf, nome)) or self._loose_code.get((uf.upper(), norm(nome)))
+
+    def locate(self, uf: Optional[str], nome: Optional[str] = None,
+               ibge_mun=None) -> Tuple[Optional[int], Optional[int]]:
+        """
+        (ibge_uf, ibge_mun) como inteiros a partir de UF/município em texto
+        livre (ou do código do município, se já conhecido). O que não for
+        reconhecido fica None.
+        """
+        mun = str(ibge_mun) if ibge_mun not in (None, "") else self.resolve(uf, nome)
+        mun = int(mun) if mun and str(mun).isdigit() else None
+        uf_code = self.uf_code.get((uf or "").strip().upper())
+        if mun is not None and uf_code is None:
+            uf_code = mun // 100_000  # os 2 primeiros dígitos do código do município são a UF
+        return uf_code, mun
+
+    def lookup(self, ibge_mun) -> Optional[Tuple[str, str]]:
+        """(nome, UF) do município pelo código IBGE."""
+        return self.mun_by_code.get(str(ibge_mun))
+
+    @staticmethod
+    def _coords(table, codes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        keys, lat, lon = table
+        codes = np.asarray(pd.to_numeric(pd.Series(codes, dtype=object), errors="coerce").fillna(-1), np.int64)
+        if not len(keys):
+            nan = np.full(len(codes), np.nan)
+            return nan, nan.copy(), np.zeros(len(codes), bool)
+        pos = np.searchsorted(keys, codes).clip(0, len(keys) - 1)
+        found = keys[pos] == codes
+        return np.where(found, lat[pos], np.nan), np.where(found, lon[pos], np.nan), found
+
+    def coords_mun(self, codes):
+        """(lat, lon, encontrado) para uma sequência de códigos IBGE de município."""
+        return self._coords(self.mun_xy, codes)
+
+    def coords_uf(self, codes):
+        """(lat, lon, encontrado) para uma sequência de códigos IBGE de UF."""
+        return self._coords(self.uf_xy, codes)
@@ -0,0 +1,193 @@
+# geostore.py
+# Malha municipal compacta para o mapa: coordenadas quantizadas (int32, grade
+# de 1e-5 grau ≈ 1 m) em vários níveis de simplificação (Douglas-Peucker),
+# num único arquivo binário lido por memmap. Abrir o arquivo só lê o
+# cabeçalho; os polígonos de um nível só são tocados quando pedidos.
+#
+# Formato (.mgeo):
+#   b"MGEO1\n" | uint32 tamanho do cabeçalho | cabeçalho JSON | arrays crus
+# O cabeçalho guarda a escala, a tolerância de cada nível e, para cada array,
+# (offset, dtype, shape). Arrays de um nível:
+#   feat  int32 [n_mun + 1]   início dos anéis de cada município em `rings`
+#   rings int32 [n_anéis + 1] início dos pontos de cada anel em `pts`
+#   pts   int32 [n_pts, 2]    lon/lat quantizados
+# Os municípios vêm ordenados por código IBGE (array `codes`, int64).
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"MGEO1\n"
+SCALE = 100_000  # unidades por grau
+# tolerância (graus) de cada nível; o nível 0 é a malha original quantizada
+LEVELS = (0.0, 0.001, 0.005, 0.02)
+
+def simplify_ring(pts: np.ndarray, tol: float) -> np.ndarray:
+    """Douglas-Peucker iterativo sobre um anel fechado (pts[0] == pts[-1])."""
+    n = len(pts)
+    if tol <= 0 or n <= 4:
+        return pts
+    keep = np.zeros(n, bool)
+    keep[0] = keep[-1] = True
+    # anel fechado: divide no ponto mais distante do primeiro para não degenerar
+    # distâncias sempre em float64: diferenças de int32 ao quadrado estourariam
+    p = pts.astype(np.float64)
+    far = int(np.argmax(((p - p[0]) ** 2).sum(axis=1)))
+    keep[far] = True
+    stack = [(0, far), (far, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg = p[b] - p[a]
+        rel = p[a + 1:b] - p[a]
+        norm2 = seg @ seg
+        if norm2 == 0:
+            d = np.sqrt((rel ** 2).sum(axis=1))
+        else:
+            d = np.abs(rel[:, 0] * seg[1] - rel[:, 1] * seg[0]) / np.sqrt(norm2)
+        i = int(np.argmax(d))
+        if d[i] > tol:
+            m = a + 1 + i
+            keep[m] = True
+            stack.append((a, m))
+            stack.append((m, b))
+    out = pts[keep]
+    return out if len(out) >= 4 else pts
+
+def _rings_of(geom) -> List[list]:
+    if geom["type"] == "Polygon":
+        return list(geom["coordinates"])
+    if geom["type"] == "MultiPolygon":
+        return [ring for poly in geom["coordinates"] for ring in poly]
+    return []
+
+def write_store(features: Iterable[Tuple[str, dict]], path: str, levels=LEVELS) -> Dict[str, int]:
+    """
+    Grava o .mgeo a partir de pares (código IBGE, geometria GeoJSON).
+    Só anéis externos e buracos de Polygon/MultiPolygon; o resto é ignorado.
+    """
+    items = sorted(((int(code), geom) for code, geom in features), key=lambda t: t[0])
+    codes = np.array([c for c, _ in items], np.int64)
+    base = []  # por município: lista de anéis quantizados (nível 0)
+    for _c, geom in items:
+        rings = []
+        for ring in _rings_of(geom):
+            q = np.rint(np.asarray(ring, float)[:, :2] * SCALE).astype(np.int32)
+            if len(q) and not np.array_equal(q[0], q[-1]):
+                q = np.vstack([q, q[:1]])
+            # descarta pontos repetidos consecutivos gerados pela quantização
+            if len(q) > 1:
+                q = q[np.r_[True, (np.diff(q, axis=0) != 0).any(axis=1)]]
+            if len(q) >= 4:
+                rings.append(q)
+        base.append(rings)
+
+    arrays = {"codes": codes}
+    header = {"scale": SCALE, "levels": []}
+    stats = {"municipios": len(codes)}
+    for li, tol in enumerate(levels):
+        feat, ring_start, chunks = [0], [0], []
+        tol_q = tol * SCALE
+        for rings in base:
+            for r in rings:
+                s = simplify_ring(r, tol_q)
+                chunks.append(s)
+                ring_start.append(ring_start[-1] + len(s))
+            feat.append(len(ring_start) - 1)
+        pts = np.vstack(chunks) if chunks else np.empty((0, 2), np.int32)
+        arrays[f"feat{li}"] = np.array(feat, np.int32)
+        arrays[f"rings{li}"] = np.array(ring_start, np.int32)
+        arrays[f"pts{li}"] = pts.astype(np.int32)
+        header["levels"].append({"tol": tol})
+        stats[f"pontos_nivel{li}"] = len(pts)
+
+    # offsets relativos ao fim do cabeçalho, alinhados em 8 bytes
+    layout, off = {}, 0
+    for name, arr in arrays.items():
+        layout[name] = [off, arr.dtype.str, list(arr.shape)]
+        off += (arr.nbytes + 7) // 8 * 8
+    header["arrays"] = layout
+    hbytes = json.dumps(header).encode()
+    hbytes += b" " * (-(len(MAGIC) + 4 + len(hbytes)) % 8)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint32(len(hbytes)).tobytes())
+        f.write(hbytes)
+        for name, arr in arrays.items():
+            data = np.ascontiguousarray(arr).tobytes()
+            f.write(data)
+            f.write(b"\0" * ((len(data) + 7) // 8 * 8 - len(data)))
+    os.replace(tmp, path)
+    stats["bytes"] = os.path.getsize(path)
+    return stats
+
+class GeometryStore:
+    """Leitor do .mgeo: cabeçalho na abertura, arrays por memmap sob demanda."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path}: não é um arquivo .mgeo")
+            hlen = int(np.frombuffer(f.read(4), np.uint32)[0])
+            header = json.loads(f.read(hlen))
+        self._data_start = len(MAGIC) + 4 + hlen
+        self.scale = header["scale"]
+        self.levels = tuple(lv["tol"] for lv in header["levels"])
+        self._layout = header["arrays"]
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _array(self, name: str) -> np.ndarray:
+        arr = self._arrays.get(name)
+        if arr is None:
+            with self._lock:
+                arr = self._arrays.get(name)
+                if arr is None:
+                    off, dtype, shape = self._layout[name]
+                    if int(np.prod(shape)) == 0:
+                        arr = np.empty(shape, dtype)
+                    else:
+                        arr = np.memmap(self.path, dtype=dtype, mode="r",
+                                        offset=self._data_start + off, shape=tuple(shape))
+                    self._arrays[name] = arr
+        return arr
+
+    @property
+    def codes(self) -> np.ndarray:
+        return self._array("codes")
+
+    def level_for_zoom(self, zoom: float) -> int:
+        """Nível de detalhe adequado ao zoom do mapa (mais zoom, menos simplificação)."""
+        wanted = 0.0 if zoom >= 9 else 0.001 if zoom >= 7 else 0.005 if zoom >= 5 else 0.02
+        best = min(range(len(self.levels)), key=lambda i: abs(self.levels[i] - wanted))
+        return best
+
+    def polygons(self, codes: Optional[Iterable] = None, level: int = 0) -> List[dict]:
+        """
+        [{"ibge_mun": código, "rings": [[[lon, lat], ...], ...]}] dos municípios
+        pedidos (todos, se `codes` for None), no nível de simplificação `level`.
+        """
+        all_codes = self.codes
+        if codes is None:
+            pos = np.arange(len(all_codes))
+        else:
+            want = np.unique(np.asarray([int(c) for c in codes if str(c).isdigit()], np.int64))
+            if not len(all_codes) or not len(want):
+                return []
+            pos = np.searchsorted(all_codes, want).clip(0, len(all_codes) - 1)
+            pos = pos[all_codes[pos] == want]
+        feat, rings, pts = self._array(f"feat{level}"), self._array(f"rings{level}"), self._array(f"pts{level}")
+        out = []
+        for i in pos:
+            rs = []
+            for r in range(feat[i], feat[i + 1]):
+                rs.append((pts[rings[r]:rings[r + 1]] / self.scale).tolist())
+            out.append({"ibge_mun": str(all_codes[i]), "rings": rs})
+        return out
@@ -0,0 +1,148 @@
+# ibge_stub.py
+# Servidor HTTP local que imita os endpoints de localidades do IBGE usados por
+# fetch_ibge_geo.py, para testar o fluxo todo sem internet. Os dados vêm dos
+# CSVs de data/geo (ou de --geo-dir). Responde com ETag e Last-Modified e
+# devolve 304 quando o cliente manda o validador atual.
+#
+#   python ibge_stub.py --port 8765 --delay 0.2
+#   python fetch_ibge_geo.py --base-url http://127.0.0.1:8765/api/v1/localidades --geo-dir /tmp/geo
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GEO_DIR = os.path.join(BASE_DIR, "data", "geo")
+PREFIX = "/api/v1/localidades"
+
+def load_fixture(geo_dir=GEO_DIR):
+    """(lista de UFs, {id da UF: municípios}) no formato JSON da API."""
+    with open(os.path.join(geo_dir, "ufs.csv"), newline="", encoding="utf-8") as f:
+        ufs = [{"id": int(r["ibge_uf"]), "sigla": r["uf"], "nome": r["uf_nome"]} for r in csv.DictReader(f)]
+    by_sigla = {u["sigla"]: u for u in ufs}
+    muns = {u["id"]: [] for u in ufs}
+    with open(os.path.join(geo_dir, "municipios.csv"), newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            uf = by_sigla.get(r["uf"])
+            if uf is None:
+                continue
+            muns[uf["id"]].append({
+                "id": int(r["ibge_mun"]), "nome": r["nome_mun"],
+                "microrregiao": {"mesorregiao": {"UF": dict(uf)}},
+            })
+    for lst in muns.values():
+        lst.sort(key=lambda m: m["nome"])
+    return sorted(ufs, key=lambda u: u["nome"]), muns
+
+class StubIBGE:
+    """
+    Servidor em thread própria. `requests` conta as requisições por status;
+    `delay` simula a latência da rede; `fail_every` devolve 503 a cada N
+    pedidos, para exercitar as novas tentativas.
+    """
+
+    def __init__(self, geo_dir=GEO_DIR, host="127.0.0.1", port=0, delay=0.0, fail_every=0):
+        ufs, muns = load_fixture(geo_dir)
+        self.delay = delay
+        self.fail_every = fail_every
+        self.requests = {}
+        self._n = 0
+        self._lock = threading.Lock()
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.bodies = {f"{PREFIX}/estados": json.dumps(ufs, ensure_ascii=False).encode()}
+        for uf_id, lst in muns.items():
+            self.bodies[f"{PREFIX}/estados/{uf_id}/municipios"] = json.dumps(lst, ensure_ascii=False).encode()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{PREFIX}"
+
+    def _count(self, status):
+        with self._lock:
+            self.requests[status] = self.requests.get(status, 0) + 1
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if stub.delay:
+                    time.sleep(stub.delay)
+                with stub._lock:
+                    stub._n += 1
+                    fail = stub.fail_every and stub._n % stub.fail_every == 0
+                if fail:
+                    stub._count(503)
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                path = self.path.split("?", 1)[0]
+                path = re.sub(r"/estados/([A-Za-z]{2})/", lambda m: f"/estados/{m.group(1).upper()}/", path)
+                body = stub.bodies.get(path)
+                if body is None:
+                    stub._count(404)
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag or (
+                        not self.headers.get("If-None-Match")
+                        and self.headers.get("If-Modified-Since") == stub.last_modified):
+                    stub._count(304)
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                stub._count(200)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", stub.last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self) -> "StubIBGE":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="ibge-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API de localidades do IBGE.")
+    parser.add_argument("--geo-dir", default=GEO_DIR, help="CSVs usados como dados")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="latência simulada por requisição (s)")
+    parser.add_argument("--fail-every", type=int, default=0, help="devolve 503 a cada N requisições")
+    args = parser.parse_args()
+    stub = StubIBGE(args.geo_dir, args.host, args.port, args.delay, args.fail_every)
+    print(f"Servindo {stub.base_url} (Ctrl+C para sair)")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# search.py
+# Busca de políticas com índice invertido (montado uma vez por catálogo) e
+# ranking BM25, e autocompletar por prefixo. Textos e consultas passam pela
+# mesma normalização de utils.norm, então "pescador", "Pescadór" e
+# "PESCADOR" são equivalentes.
+
+import heapq
+import math
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from textnorm import norm, tokens
+
+# peso de cada coluna na contagem de termos (BM25F simplificado)
+FIELD_WEIGHTS = {
+    "Politicas publicas": 3.0,
+    "Organização interna (Subprogramas e/ou Eixos)": 1.5,
+    "Descrição dos direitos": 1.0,
+    "Acesso": 1.0,
+}
+
+SUBPROGRAM_COL = "Organização interna (Subprogramas e/ou Eixos)"
+
+class SearchIndex:
+    """
+    Índice invertido termo -> {documento: frequência ponderada}, com
+    vocabulário ordenado para expandir prefixos ("pesc" -> pesca, pescador...).
+    Cada termo da consulta precisa aparecer (E lógico); o resultado vem
+    ordenado por BM25.
+    """
+
+    def __init__(self, search_text: pd.DataFrame, groups: Optional[pd.Series] = None,
+                 k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.labels: List[Any] = list(search_text.index)
+        self.postings: Dict[str, Dict[int, float]] = {}
+        lengths = [0.0] * len(self.labels)
+        for col in search_text.columns:
+            w = FIELD_WEIGHTS.get(col, 1.0)
+            for doc, text in enumerate(search_text[col].tolist()):
+                for term in tokens(text or ""):
+                    post = self.postings.setdefault(term, {})
+                    post[doc] = post.get(doc, 0.0) + w
+                    lengths[doc] += w
+        self.lengths = lengths
+        self.avg_len = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self.vocab = sorted(self.postings)
+        n = len(self.labels)
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+        # grupo (ex.: nível) -> documentos, para filtrar sem varrer o catálogo
+        self.groups: Dict[Any, set] = {}
+        if groups is not None:
+            for doc, g in enumerate(groups.reindex(search_text.index).tolist()):
+                if isinstance(g, str) or pd.notna(g):
+                    self.groups.setdefault(g, set()).add(doc)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def expand(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Termos do vocabulário que começam com `prefix` (todos, ou no máximo `limit`)."""
+        lo = bisect_left(self.vocab, prefix)
+        hi = bisect_left(self.vocab, prefix + "\uffff", lo)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self.vocab[lo:hi]
+
+    def search(self, query: str, groups: Optional[Iterable[Any]] = None) -> List[Any]:
+        """
+        Rótulos (índice do df) dos documentos que contêm todos os termos da
+        consulta (cada termo vale também como prefixo), do mais ao menos
+        relevante. `groups` restringe aos grupos escolhidos (ex.: níveis).
+        """
+        terms = tokens(norm(query))
+        if not terms:
+            return []
+        candidates = None
+        if groups:
+            candidates = set()
+            for g in groups:
+                candidates |= self.groups.get(g, set())
+        expanded = []
+        for term in dict.fromkeys(terms):
+            group = self.expand(term)
+            if not group:
+                return []
+            docs = set()
+            for t in group:
+                docs.update(self.postings[t])
+            candidates = docs if candidates is None else (candidates & docs)
+            if not candidates:
+                return []
+            expanded.append(group)
+
+        # acumula termo a termo: o custo é o das listas dos termos expandidos,
+        # não (candidatos x termos), o que importa em prefixos curtos ("p")
+        k1, b, avg = self.k1, self.b, self.avg_len or 1.0
+        scores = dict.fromkeys(candidates, 0.0)
+        for group in expanded:
+            for t in group:
+                w = self.idf[t] * (k1 + 1)
+                for doc, tf in self.postings[t].items():
+                    if doc in scores:
+                        scores[doc] += w * tf / (tf + k1 * (1 - b + b * self.lengths[doc] / avg))
+        ranked = sorted(scores, key=lambda d: (-scores[d], d))
+        return [self.labels[d] for d in ranked]
+
+class Autocomplete:
+    """
+    Sugestões por prefixo sobre um vetor ordenado de chaves normalizadas.
+    Cada entrada é indexada a partir de cada palavra ("def" acha
+    "Seguro-Defeso"). Prefixos de até `short` caracteres têm a lista dos
+    melhores já pronta; nos demais o intervalo do bisect é pequeno.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, float]], short: int = 3, keep: int = 20):
+        merged: Dict[str, list] = {}
+        for display, kind, weight in entries:
+            display = str(display).strip()
+            if display:
+                cur = merged.setdefault(display, [kind, 0.0])
+                cur[1] += weight
+        self.items = [(d, kind, w) for d, (kind, w) in merged.items()]
+        # ordem de desempate: maior peso, texto mais curto, alfabética
+        self._rank = {i: (-w, len(d), d) for i, (d, _k, w) in enumerate(self.items)}
+
+        pairs = []
+        for i, (display, _k, _w) in enumerate(self.items):
+            ws = tokens(norm(display))
+            for j in range(len(ws)):
+                pairs.append((" ".join(ws[j:]), i))
+        pairs.sort()
+        self.keys = [k for k, _ in pairs]
+        self.ids = [i for _, i in pairs]
+
+        self.short = short
+        groups: Dict[str, set] = {}
+        for key, i in pairs:
+            for n in range(1, min(short, len(key)) + 1):
+                groups.setdefault(key[:n], set()).add(i)
+        self._top = {p: sorted(ids, key=self._rank.__getitem__)[:keep] for p, ids in groups.items()}
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Tuple[str, str]]:
+        """Até `limit` pares (texto, tipo) cujo começo de alguma palavra casa com `prefix`."""
+        p = " ".join(tokens(norm(prefix)))
+        if not p:
+            return []
+        if len(p) <= self.short:
+            ids = self._top.get(p, [])[:limit]
+        else:
+            lo = bisect_left(self.keys, p)
+            hi = bisect_left(self.keys, p + "\uffff")
+            ids = heapq.nsmallest(limit, set(self.ids[lo:hi]), key=self._rank.__getitem__)
+        return [(self.items[i][0], self.items[i][1]) for i in ids]
+
+def autocomplete_entries(df: pd.DataFrame, kw_map: Dict[str, Dict[str, Any]], policy_keys: Dict[Any, tuple],
+                         searches: Optional[Dict[str, int]] = None, boost: float = 0.5):
+    """
+    (texto, tipo, peso) para o Autocomplete: nomes de políticas e de
+    subprogramas/eixos (peso = nº de linhas no catálogo) e chaves do
+    keyword_map (peso = nº de políticas que as exigem). Buscas registradas
+    em analytics_events somam `boost` x contagem às sugestões que começam
+    com o termo buscado.
+    """
+    entries = []
+    if "Politicas publicas" in df.columns:
+        for name, n in Counter(df["Politicas publicas"].dropna().astype(str)).items():
+            entries.append((name, "política", float(n)))
+    if SUBPROGRAM_COL in df.columns:
+        names = Counter()
+        for cell in df[SUBPROGRAM_COL].dropna().astype(str):
+            for line in cell.splitlines():
+                name = line.split(":", 1)[0].strip()
+                if name and name.upper() != "NC" and len(name) <= 80:
+                    names[name] += 1
+        for name, n in names.items():
+            entries.append((name, "subprograma", float(n)))
+    uses = Counter(k for keys in policy_keys.values() for k in keys)
+    for key in kw_map:
+        entries.append((key, "requisito", float(uses.get(key, 0))))
+
+    if searches:
+        # chaves normalizadas ordenadas: cada busca acha as entradas que começam
+        # com ela num intervalo do bisect (buscas x log entradas, não buscas x entradas)
+        keyed = sorted({(" ".join(tokens(norm(d))), d) for d, _k, _w in entries})
+        keys = [k for k, _d in keyed]
+        hits = Counter()
+        for query, count in searches.items():
+            q = " ".join(tokens(norm(query)))
+            if q:
+                lo = bisect_left(keys, q)
+                hi = bisect_left(keys, q + "\uffff", lo)
+                for _k, d in keyed[lo:hi]:
+                    hits[d] += count
+        entries = [(d, k, w + boost * hits.get(d, 0)) for d, k, w in entries]
+    return entries
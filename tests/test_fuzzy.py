@@ -0,0 +1,30 @@
+# Detecção aproximada: aliases e palavras inteiras sim, pedaços de palavra não.
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fuzzy import build_fuzzy_requirement_index  # noqa: E402
+
+
+def _detect(texts):
+    with open(os.path.join(ROOT, "keyword_map.json"), encoding="utf-8") as f:
+        kw_map = json.load(f)
+    index = build_fuzzy_requirement_index(list(enumerate(texts)), kw_map)
+    return [set(index.policy_keys.get(i, ())) for i in range(len(texts))]
+
+
+def test_no_match_inside_other_words():
+    sorgpx, rendaria = _detect(["Ter cargo na sorgpx", "rendaria"])
+    assert "rgp" not in sorgpx
+    assert "renda" not in rendaria
+
+
+def test_aliases_and_whole_words():
+    found = _detect(["Inscrição no Cadastro Único", "jovens de 15 a 29 anos", "Documentos: ICPF/CNPJ", "RGP ativo"])
+    assert "cadunico" in found[0]
+    assert "jovem" in found[1]
+    assert {"cpf", "cnpj"} <= found[2]
+    assert "rgp" in found[3]
@@ -0,0 +1,19 @@
+# Os índices da migração 6 precisam continuar servindo as consultas de db.py.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+def test_query_plans_use_indexes(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "plans.db"))
+    try:
+        assert db.bootstrap_db() == db.SCHEMA_VERSION
+        plans = db.check_query_plans()
+        assert plans
+        bad = [(p["name"], p["index"], p["plan"]) for p in plans if not p["ok"]]
+        assert not bad, bad
+    finally:
+        db.close_pools()
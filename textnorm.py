@@ -0,0 +1,72 @@
+# textnorm.py
+# Normalização de texto usada no casamento de requisitos e na busca:
+# minúsculas, sem acentos, só [a-z0-9 -_/] e espaços simples.
+
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+_KEEP = frozenset("abcdefghijklmnopqrstuvwxyz0123456789-_/")
+_SHORT = 64          # strings até este tamanho passam pelo cache LRU
+_SEP = "\x1f"        # separador usado no modo em lote
+
+def _fold(cp: int) -> str:
+    """Decompõe (NFD), descarta acentos (Mn) e troca o que não for permitido por espaço."""
+    out = []
+    for c in unicodedata.normalize("NFD", chr(cp)):
+        if unicodedata.category(c) == "Mn":
+            continue
+        out.append(c if c in _KEEP else " ")
+    return "".join(out)
+
+class _FoldTable(dict):
+    """Tabela para str.translate; códigos fora da faixa pré-calculada são resolvidos sob demanda."""
+
+    def __missing__(self, cp: int) -> str:
+        v = self[cp] = _fold(cp)
+        return v
+
+# Latin-1 + Latin Extended-A/B já vêm prontos; o resto entra na primeira ocorrência
+_TABLE = _FoldTable((cp, _fold(cp)) for cp in range(0x250))
+_BATCH_TABLE = _FoldTable(_TABLE)
+_BATCH_TABLE[ord(_SEP)] = _SEP
+
+def _norm_str(s: str) -> str:
+    return " ".join(s.lower().translate(_TABLE).split())
+
+_norm_cached = lru_cache(maxsize=8192)(_norm_str)
+
+def norm(s) -> str:
+    if s is None:
+        return ""
+    s = str(s)
+    return _norm_cached(s) if len(s) <= _SHORT else _norm_str(s)
+
+def norm_many(values) -> list:
+    """
+    Normaliza uma lista de strings de uma vez: valores repetidos são
+    processados uma única vez e o lower/translate roda sobre um só texto.
+    """
+    values = ["" if v is None else str(v) for v in values]
+    uniques = list(dict.fromkeys(values))
+    joined = _SEP.join(uniques)
+    if _SEP in "".join(uniques):
+        normed = [_norm_str(u) for u in uniques]
+    else:
+        normed = [" ".join(p.split()) for p in joined.lower().translate(_BATCH_TABLE).split(_SEP)]
+    lookup = dict(zip(uniques, normed))
+    return [lookup[v] for v in values]
+
+def norm_series(series: pd.Series) -> pd.Series:
+    """Versão em lote de norm() para uma Series; valores ausentes (NaN/None) viram ""."""
+    values = series.astype(object).where(series.notna(), None).to_numpy()
+    return pd.Series(np.array(norm_many(values), dtype=object), index=series.index, name=series.name)
+
+_TOKEN_SPLIT = re.compile(r"[\s/_\-]+")
+
+def tokens(text: str) -> list:
+    """Palavras de um texto já normalizado ("cpf/cnpj" -> ["cpf", "cnpj"])."""
+    return [w for w in _TOKEN_SPLIT.split(text) if w]
@@ -1,19 +1,97 @@
 
-import re, json, unicodedata
+import json, operator, hashlib, heapq, threading, time
+from collections import OrderedDict
 from typing import Dict, Any, List, Tuple
 
-def norm(s: str) -> str:
-    if s is None:
-        return ""
-    s = str(s).lower()
-    s = "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
-    s = re.sub(r"[^a-z0-9\s\-_/]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+import numpy as np
+import pandas as pd
+
+from textnorm import norm, norm_many, norm_series  # noqa: F401 (reexportados)
 
 def load_keyword_map(path: str) -> Dict[str, Dict[str, Any]]:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
+
+class KeywordMatcher:
+    """
+    Autômato Aho-Corasick com todas as palavras-chave do keyword_map.
+    Uma única passada no texto encontra todas as ocorrências (inclusive
+    sobrepostas), com o mesmo resultado de `key in texto` para cada chave.
+    """
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self._order = {k: i for i, k in enumerate(self.keys)}
+        # chave vazia casa com qualquer texto (mesma semântica de "" in s)
+        self._always = [k for k in self.keys if k == ""]
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[str]] = [[]]
+        for key in self.keys:
+            if not key:
+                continue
+            st = 0
+            for ch in key:
+                nxt = goto[st].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[st][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                st = nxt
+            out[st].append(key)
+
+        # links de falha (BFS); as saídas herdam as do estado de falha
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())  # filhos da raiz falham para a raiz
+        for st in queue:
+            for ch, nxt in goto[st].items():
+                queue.append(nxt)
+                f = fail[st]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._goto, self._fail = goto, fail
+        self._out = [tuple(o) for o in out]
+
+    def find(self, text: str) -> List[str]:
+        """Chaves presentes em `text`, na ordem do keyword_map."""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = set(self._always)
+        st = 0
+        for ch in text:
+            while st and ch not in goto[st]:
+                st = fail[st]
+            st = goto[st].get(ch, 0)
+            if out[st]:
+                hits.update(out[st])
+        return sorted(hits, key=self._order.__getitem__)
+
+_MEMO_MAX = 8
+_MATCHERS: Dict[Tuple[str, ...], KeywordMatcher] = {}
+# get_matcher/get_rules também rodam na thread que recarrega o Engine: o valor
+# é montado fora do lock e só a publicação/descarte no dicionário é protegida
+_MEMO_LOCK = threading.Lock()
+
+def get_matcher(kw_map: Dict[str, Dict[str, Any]]) -> KeywordMatcher:
+    """Devolve (e memoriza) o autômato compilado para as chaves do mapa."""
+    keys = tuple(kw_map)
+    m = _MATCHERS.get(keys)
+    if m is None:
+        built = KeywordMatcher(keys)
+        with _MEMO_LOCK:
+            m = _MATCHERS.get(keys)
+            if m is None:
+                if len(_MATCHERS) >= _MEMO_MAX:  # recargas do mapa não acumulam autômatos antigos
+                    _MATCHERS.pop(next(iter(_MATCHERS)))
+                m = _MATCHERS[keys] = built
+    return m
+
+_NUM_OPS = {
+    "<=": operator.le, ">=": operator.ge, "==": operator.eq,
+    "<": operator.lt, ">": operator.gt, "!=": operator.ne,
+}
+
 def check_condition(user_value, cond):
     """
     Valida o valor do perfil do usuário (user_value) contra a regra cond.
@@ -61,15 +139,539 @@ def check_condition(user_value, cond):
     # Se o tipo não for reconhecido, falha com segurança
     return False
 
-def evaluate_requirements(requirement_text: str, profile: Dict[str, Any], kw_map: Dict[str, Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+# --- Compilador de regras -------------------------------------------------
+# Cada entrada do keyword_map vira um nó de um grafo de predicados. Além do
+# formato plano (field/type/op/value), uma regra pode ser composta:
+#   {"all": [cond, ...]}, {"any": [cond, ...]}, {"not": cond}
+#   {"field": ["campo_a", "campo_b"], ...}  -> basta um dos campos atender
+# Subcondições sem "field" herdam o campo da regra-mãe. Condições idênticas
+# (mesmo campo/tipo/op/valor) viram um único nó, avaliado uma vez por perfil.
+def _false(_v):
+    return False
+
+def _compile_leaf(cond: Dict[str, Any]):
+    """Pré-processa type/op/value e devolve uma função valor -> bool."""
+    t = (cond.get("type") or "").lower()
+    op = cond.get("op")
+    expected = cond.get("value", True)
+
+    if t == "bool":
+        exp_b = bool(expected)
+        return lambda v: bool(v) == exp_b
+
+    if t == "number":
+        if op == "between":
+            try:
+                lo, hi = (float(x) for x in expected)
+            except Exception:
+                return _false
+            test = lambda x: lo <= x <= hi
+        else:
+            cmp = _NUM_OPS.get(op)
+            try:
+                exp_v = float(expected)
+            except Exception:
+                return _false
+            if cmp is None:
+                return _false
+            test = lambda x: cmp(x, exp_v)
+
+        def number(v):
+            try:
+                user_v = float(v)
+            except Exception:
+                return False
+            return user_v == user_v and test(user_v)  # "nan" também conta como ausente
+        return number
+
+    if t == "select_in":
+        exp_list = expected if isinstance(expected, (list, tuple, set)) else [expected]
+        options = frozenset(map(str, exp_list))
+        return lambda v: str(v) in options
+
+    if t == "text":
+        exp_n = norm(expected)
+        return lambda v: norm(v) == exp_n
+
+    return _false
+
+class RuleGraph:
+    """Regras do keyword_map compiladas em um grafo de predicados compartilhados."""
+
+    def __init__(self, kw_map: Dict[str, Dict[str, Any]]):
+        self._nodes: List[Tuple[str, Any]] = []   # (tipo, argumento)
+        self._ids: Dict[Any, int] = {}            # assinatura -> nó
+        self.rule_node = {}
+        self.rule_fields = {}
+        for key, cond in kw_map.items():
+            fields: List[str] = []
+            self.rule_node[key] = self._compile(cond, None, fields)
+            self.rule_fields[key] = tuple(dict.fromkeys(fields))
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _intern(self, sig, node) -> int:
+        nid = self._ids.get(sig)
+        if nid is None:
+            nid = self._ids[sig] = len(self._nodes)
+            self._nodes.append(node)
+        return nid
+
+    def _compile(self, cond: Dict[str, Any], field, fields: List[str]) -> int:
+        field = cond.get("field", field)
+        for kind in ("all", "any"):
+            if kind in cond:
+                children = tuple(self._compile(c, field, fields) for c in cond[kind])
+                return self._intern((kind, children), (kind, children))
+        if "not" in cond:
+            child = self._compile(cond["not"], field, fields)
+            return self._intern(("not", child), ("not", child))
+        if isinstance(field, (list, tuple)):
+            children = tuple(self._compile({**cond, "field": f}, f, fields) for f in field)
+            return self._intern(("any", children), ("any", children))
+
+        fields.append(field)
+        spec = {k: v for k, v in cond.items() if k not in ("label", "weight", "min_similarity", "aliases")}
+        spec["field"] = field  # campo herdado entra na assinatura: mesma condição em campos distintos = nós distintos
+        sig = ("leaf", json.dumps(spec, sort_keys=True, ensure_ascii=False, default=str))
+        return self._intern(sig, ("leaf", (field, _compile_leaf(cond), spec)))
+
+    def fields(self, key: str) -> Tuple[str, ...]:
+        """Campos do perfil lidos pela regra `key`."""
+        return self.rule_fields[key]
+
+    def bind(self, profile: Dict[str, Any]):
+        """
+        Avaliador de regras para um perfil: key -> bool. Cada nó do grafo é
+        calculado no máximo uma vez (memo compartilhado entre as regras).
+        """
+        nodes, memo = self._nodes, [None] * len(self._nodes)
+
+        def ev(nid: int) -> bool:
+            r = memo[nid]
+            if r is None:
+                kind, arg = nodes[nid]
+                if kind == "leaf":
+                    r = arg[1](profile.get(arg[0]))
+                elif kind == "all":
+                    r = all(ev(c) for c in arg)
+                elif kind == "any":
+                    r = any(ev(c) for c in arg)
+                else:
+                    r = not ev(arg)
+                memo[nid] = r
+            return r
+
+        rule_node = self.rule_node
+        return lambda key: ev(rule_node[key])
+
+    def bind_frame(self, profiles: pd.DataFrame):
+        """Como bind(), mas vetorizado: key -> array booleano (um valor por linha)."""
+        nodes, memo, n = self._nodes, {}, len(profiles)
+
+        def ev(nid: int) -> np.ndarray:
+            r = memo.get(nid)
+            if r is None:
+                kind, arg = nodes[nid]
+                if kind == "leaf":
+                    field, _, spec = arg
+                    col = (profiles[field] if field in profiles.columns
+                           else pd.Series([None] * n, index=profiles.index, dtype=object))
+                    r = _column_condition(col, spec)
+                elif kind == "all":
+                    r = np.logical_and.reduce([ev(c) for c in arg]) if arg else np.ones(n, dtype=bool)
+                elif kind == "any":
+                    r = np.logical_or.reduce([ev(c) for c in arg]) if arg else np.zeros(n, dtype=bool)
+                else:
+                    r = ~ev(arg)
+                memo[nid] = r
+            return r
+
+        rule_node = self.rule_node
+        return lambda key: ev(rule_node[key])
+
+_RULES: Dict[int, Tuple[Dict[str, Dict[str, Any]], RuleGraph]] = {}
+
+def get_rules(kw_map: Dict[str, Dict[str, Any]]) -> RuleGraph:
+    """Devolve (e memoriza) o grafo compilado deste keyword_map."""
+    hit = _RULES.get(id(kw_map))
+    if hit is None or hit[0] is not kw_map:
+        built = (kw_map, RuleGraph(kw_map))
+        with _MEMO_LOCK:
+            hit = _RULES.get(id(kw_map))
+            if hit is None or hit[0] is not kw_map:
+                if len(_RULES) >= _MEMO_MAX:
+                    _RULES.pop(next(iter(_RULES)))
+                hit = _RULES[id(kw_map)] = built
+    return hit[1]
+
+def evaluate_requirements(requirement_text: str, profile: Dict[str, Any], kw_map: Dict[str, Dict[str, Any]],
+                          matcher: KeywordMatcher = None, rules: RuleGraph = None) -> Tuple[List[str], List[str]]:
     req = norm(requirement_text)
+    matcher = matcher or get_matcher(kw_map)
+    check = (rules or get_rules(kw_map)).bind(profile)
+    met, missing = [], []
+    for key in matcher.find(req):
+        ok = check(key)
+        label = kw_map[key].get("label", key)
+        if ok:
+            met.append(label)
+        else:
+            missing.append(label)
+    return met, missing
+
+
+class RequirementIndex:
+    """
+    Índice de requisitos pré-calculado a partir da coluna "Acesso".
+    - policy_keys: política (índice do df) -> chaves do keyword_map acionadas
+    - field_policies: campo do perfil -> políticas que dependem dele
+    - field_keys: campo do perfil -> regras (chaves) que o leem
+    """
+
+    def __init__(self, policy_keys: Dict[Any, Tuple[str, ...]], kw_map: Dict[str, Dict[str, Any]]):
+        self.policy_keys = policy_keys
+        self.rules = get_rules(kw_map)
+        used = set().union(*policy_keys.values())
+        self.keys = tuple(k for k in kw_map if k in used)
+        self.field_keys: Dict[str, List[str]] = {}
+        for key in self.keys:
+            for field in self.rules.fields(key):
+                self.field_keys.setdefault(field, []).append(key)
+        self.field_policies: Dict[str, List[Any]] = {}
+        for idx, keys in policy_keys.items():
+            for field in dict.fromkeys(f for k in keys for f in self.rules.fields(k)):
+                self.field_policies.setdefault(field, []).append(idx)
+        # bitsets: um bit por regra; policy_mask = requisitos mapeados da política
+        self.key_bit = {key: 1 << i for i, key in enumerate(self.keys)}
+        self.policy_mask: Dict[Any, int] = {}
+        for idx, keys in policy_keys.items():
+            mask = 0
+            for key in keys:
+                mask |= self.key_bit[key]
+            self.policy_mask[idx] = mask
+        # pesos opcionais por requisito ("weight" no keyword_map; padrão 1)
+        self.key_weight = {key: float(kw_map[key].get("weight", 1.0)) for key in self.keys}
+        self.policy_weight = {idx: sum(self.key_weight[k] for k in keys) for idx, keys in policy_keys.items()}
+
+    def __len__(self):
+        return len(self.policy_keys)
+
+def build_requirement_index(texts, kw_map: Dict[str, Dict[str, Any]], matcher: KeywordMatcher = None,
+                            normed=None) -> RequirementIndex:
+    """
+    texts: a coluna "Acesso" (Series) ou pares (idx, acesso).
+    normed: opcional, os mesmos textos já normalizados (ex.: vindos do snapshot do catálogo).
+    Só entram políticas com texto de acesso e ao menos uma chave detectada.
+    """
+    matcher = matcher or get_matcher(kw_map)
+    pairs = list(texts.items() if isinstance(texts, pd.Series) else texts)
+    normed = list(normed) if normed is not None else norm_many([str(acesso) for _, acesso in pairs])
+    policy_keys = {}
+    for (idx, acesso), req in zip(pairs, normed):
+        keys = matcher.find(req)
+        if acesso and keys:
+            policy_keys[idx] = tuple(keys)
+    return RequirementIndex(policy_keys, kw_map)
+
+def evaluate_policy(index: RequirementIndex, idx, profile: Dict[str, Any], kw_map: Dict[str, Dict[str, Any]]):
+    """(met, missing) de uma política do índice para o perfil."""
+    check = index.rules.bind(profile)
     met, missing = [], []
-    for key, cond in kw_map.items():
-        if key in req:
-            ok = check_condition(profile.get(cond["field"]), cond)
-            label = cond.get("label", key)
-            if ok:
-                met.append(label)
-            else:
-                missing.append(label)
+    for key in index.policy_keys.get(idx, ()):
+        (met if check(key) else missing).append(kw_map[key].get("label", key))
     return met, missing
+
+def match_profile(index: RequirementIndex, profile: Dict[str, Any], kw_map: Dict[str, Dict[str, Any]]):
+    """
+    Separa as políticas do índice em (elegíveis, quase elegíveis), cada item
+    no formato (idx, met, missing). Cada regra é avaliada uma vez por perfil.
+    """
+    check = index.rules.bind(profile)
+    status = {key: (check(key), kw_map[key].get("label", key)) for key in index.keys}
+
+    eligible_rows, nearly_rows = [], []
+    for idx, keys in index.policy_keys.items():
+        met, missing = [], []
+        for key in keys:
+            ok, label = status[key]
+            (met if ok else missing).append(label)
+        (nearly_rows if missing else eligible_rows).append((idx, met, missing))
+    return eligible_rows, nearly_rows
+
+
+def top_matches_split(index: RequirementIndex, profile: Dict[str, Any], kw_map: Dict[str, Dict[str, Any]],
+                      k: int = 20):
+    """
+    (elegíveis, quase elegíveis): até k políticas de cada, como
+    (idx, score, met, missing). score = peso dos requisitos atendidos / peso
+    total dos requisitos mapeados (1.0 = elegível). Cada lista tem a sua
+    seleção por heap (heapq): elegíveis por score (empate: ordem do catálogo);
+    quase elegíveis pelo nº de requisitos faltantes, depois maior score e
+    ordem do catálogo. Só para as escolhidas as listas met/missing são montadas.
+    """
+    check = index.rules.bind(profile)
+    weight = index.key_weight
+    ok = {key: check(key) for key in index.keys}
+
+    eligible, nearly = [], []
+    for pos, (idx, keys) in enumerate(index.policy_keys.items()):
+        total = index.policy_weight[idx]
+        score = (sum(weight[key] for key in keys if ok[key]) / total) if total else 1.0
+        gap = sum(1 for key in keys if not ok[key])
+        if gap:
+            nearly.append((gap, -score, pos, idx))
+        else:
+            eligible.append((score, -pos, idx))
+
+    def rows(selected):
+        out = []
+        for score, idx in selected:
+            met, missing = [], []
+            for key in index.policy_keys[idx]:
+                (met if ok[key] else missing).append(kw_map[key].get("label", key))
+            out.append((idx, score, met, missing))
+        return out
+
+    return (rows((s, idx) for s, _p, idx in heapq.nlargest(k, eligible)),
+            rows((-s, idx) for _g, s, _p, idx in heapq.nsmallest(k, nearly)))
+
+# --- Bitsets de requisitos --------------------------------------------------
+def profile_mask(index: RequirementIndex, profile: Dict[str, Any]) -> int:
+    """Bitset das regras do índice que o perfil atende."""
+    check = index.rules.bind(profile)
+    mask = 0
+    for key, bit in index.key_bit.items():
+        if check(key):
+            mask |= bit
+    return mask
+
+def unlock_suggestions(index: RequirementIndex, sat_mask: int, top: int = 5) -> List[Tuple[str, int, int]]:
+    """
+    Requisitos faltantes que mais destravam políticas: (chave, políticas que
+    ficariam 100% elegíveis só com ele, políticas em que ele falta).
+    """
+    unlock: Dict[int, int] = {}
+    blocking: Dict[int, int] = {}
+    for mask in index.policy_mask.values():
+        missing = mask & ~sat_mask
+        if not missing:
+            continue
+        if missing & (missing - 1) == 0:   # falta exatamente um requisito
+            unlock[missing] = unlock.get(missing, 0) + 1
+        while missing:
+            bit = missing & -missing
+            blocking[bit] = blocking.get(bit, 0) + 1
+            missing ^= bit
+    bit_key = {bit: key for key, bit in index.key_bit.items()}
+    ranked = sorted(blocking, key=lambda b: (-unlock.get(b, 0), -blocking[b], b))
+    return [(bit_key[b], unlock.get(b, 0), blocking[b]) for b in ranked[:top]]
+
+def profile_key(index: RequirementIndex, profile: Dict[str, Any]) -> str:
+    """Hash canônico só dos campos do perfil que alguma regra do índice lê."""
+    relevant = {f: profile.get(f) for f in sorted(index.field_keys)}
+    raw = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    Cache LRU com validade (TTL) de resultados de elegibilidade, compartilhável
+    entre sessões. `version` identifica a origem dos dados (planilha + mapa):
+    quando muda, todo o conteúdo anterior é descartado.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get_or_compute(self, key: str, version, compute):
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                if self._data:
+                    self.invalidations += 1
+                self._data.clear()
+                self._version = version
+            hit = self._data.get(key)
+            if hit is not None and now - hit[0] <= self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            self.misses += 1
+
+        value = compute()  # fora do lock: sessões distintas não se bloqueiam
+        with self._lock:
+            if version == self._version:
+                self._data[key] = (now, value)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data), "hits": self.hits, "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions, "invalidations": self.invalidations,
+            }
+
+class EligibilityState:
+    """
+    Elegibilidade de um perfil mantida de forma incremental (simulação "e se").
+    update(campo, valor) reavalia só as regras que leem o campo e só as
+    políticas que dependem dele (RequirementIndex.field_policies).
+    """
+
+    def __init__(self, index: RequirementIndex, kw_map: Dict[str, Dict[str, Any]], profile: Dict[str, Any]):
+        self.index = index
+        self.kw_map = kw_map
+        self.profile = dict(profile)
+        check = index.rules.bind(self.profile)
+        self.status = {key: check(key) for key in index.keys}
+        self.missing_cnt = {idx: sum(not self.status[k] for k in keys)
+                            for idx, keys in index.policy_keys.items()}
+        self.eligible_cnt = sum(1 for c in self.missing_cnt.values() if c == 0)
+        self.nearly_cnt = len(self.missing_cnt) - self.eligible_cnt
+
+    def update(self, field: str, value) -> List[Any]:
+        """Altera um campo do perfil; devolve as políticas cujo status mudou."""
+        if field in self.profile and self.profile[field] == value:
+            return []
+        self.profile[field] = value
+        check = self.index.rules.bind(self.profile)
+        flipped = {}
+        for key in self.index.field_keys.get(field, ()):
+            ok = check(key)
+            if ok != self.status[key]:
+                self.status[key] = ok
+                flipped[key] = ok
+        if not flipped:
+            return []
+
+        changed = []
+        policy_keys, status = self.index.policy_keys, self.status
+        for idx in self.index.field_policies.get(field, ()):
+            before = self.missing_cnt[idx]
+            after = sum(not status[k] for k in policy_keys[idx])
+            if after != before:
+                self.missing_cnt[idx] = after
+                if (before == 0) != (after == 0):
+                    delta = 1 if after == 0 else -1
+                    self.eligible_cnt += delta
+                    self.nearly_cnt -= delta
+                    changed.append(idx)
+        return changed
+
+    def rows(self):
+        """(elegíveis, quase elegíveis) no formato de match_profile."""
+        eligible_rows, nearly_rows = [], []
+        for idx, keys in self.index.policy_keys.items():
+            met, missing = [], []
+            for key in keys:
+                label = self.kw_map[key].get("label", key)
+                (met if self.status[key] else missing).append(label)
+            (nearly_rows if missing else eligible_rows).append((idx, met, missing))
+        return eligible_rows, nearly_rows
+
+# --- Avaliação em lote (muitos perfis de uma vez) -------------------------
+def _as_float(v):
+    try:
+        return float(v)
+    except Exception:
+        return np.nan
+
+def _column_condition(col: pd.Series, cond: Dict[str, Any]) -> np.ndarray:
+    """
+    Versão vetorizada de check_condition para uma coluna inteira.
+    Células vazias (NaN/None) valem como campo ausente no perfil (None).
+    """
+    t = (cond.get("type") or "").lower()
+    op = cond.get("op")
+    expected = cond.get("value", True)
+    present = col.notna().to_numpy()
+
+    if t == "bool":
+        truthy = col.astype(bool).to_numpy() & present
+        return truthy if bool(expected) else ~truthy
+
+    if t == "number":
+        try:
+            bounds = [float(x) for x in expected] if op == "between" else [float(expected)]
+        except Exception:
+            return np.zeros(len(col), dtype=bool)
+        cmp = _NUM_OPS.get(op)
+        if (op == "between" and len(bounds) != 2) or (op != "between" and cmp is None):
+            return np.zeros(len(col), dtype=bool)
+        if pd.api.types.is_numeric_dtype(col):
+            vals = col.to_numpy(dtype=float, na_value=np.nan)
+        else:
+            vals = np.fromiter((_as_float(v) for v in col.where(col.notna(), None)), dtype=float, count=len(col))
+        with np.errstate(invalid="ignore"):
+            if op == "between":
+                return (vals >= bounds[0]) & (vals <= bounds[1])
+            # NaN = ausente ou não numérico: nunca atende (com "!=", cmp daria True)
+            return cmp(vals, bounds[0]) & ~np.isnan(vals)
+
+    if t == "select_in":
+        exp_list = expected if isinstance(expected, (list, tuple, set)) else [expected]
+        as_str = col.astype(object).where(col.notna(), None).map(str)
+        return as_str.isin(set(map(str, exp_list))).to_numpy()
+
+    if t == "text":
+        return (norm_series(col) == norm(expected)).to_numpy()
+
+    return np.zeros(len(col), dtype=bool)
+
+class BatchResult:
+    """
+    Resultado de evaluate_batch para P perfis x N políticas do índice.
+    - ok[p, k]: regra keys[k] atendida pelo perfil p
+    - missing_count[p, n]: nº de requisitos faltantes do perfil p na política n
+    - eligible / nearly: matrizes booleanas P x N
+    """
+
+    def __init__(self, index: RequirementIndex, kw_map: Dict[str, Dict[str, Any]], ok: np.ndarray):
+        self.index = index
+        self.kw_map = kw_map
+        self.policies = list(index.policy_keys)
+        self.keys = index.keys
+        self.ok = ok
+        col = self._col = {k: i for i, k in enumerate(self.keys)}
+        incidence = np.zeros((len(self.keys), len(self.policies)), dtype=np.int32)
+        for n, keys in enumerate(index.policy_keys.values()):
+            for key in keys:
+                incidence[col[key], n] += 1
+        self.missing_count = (~ok).astype(np.int32) @ incidence
+        self.eligible = self.missing_count == 0
+        self.nearly = ~self.eligible
+
+    def rows(self, p: int):
+        """(elegíveis, quase elegíveis) do perfil p, no formato de match_profile."""
+        col, ok = self._col, self.ok[p].tolist()
+        eligible_rows, nearly_rows = [], []
+        for idx, keys in self.index.policy_keys.items():
+            met, missing = [], []
+            for key in keys:
+                label = self.kw_map[key].get("label", key)
+                (met if ok[col[key]] else missing).append(label)
+            (nearly_rows if missing else eligible_rows).append((idx, met, missing))
+        return eligible_rows, nearly_rows
+
+def evaluate_batch(profiles: pd.DataFrame, index: RequirementIndex, kw_map: Dict[str, Dict[str, Any]]) -> BatchResult:
+    """
+    Avalia uma tabela de perfis (uma linha por perfil, colunas = campos) contra
+    o índice de requisitos. Cada condição distinta é calculada uma única vez
+    por coluna; o resultado equivale a match_profile linha a linha.
+    """
+    check = index.rules.bind_frame(profiles)
+    ok = np.zeros((len(profiles), len(index.keys)), dtype=bool)
+    for k, key in enumerate(index.keys):
+        ok[:, k] = check(key)
+    return BatchResult(index, kw_map, ok)